@@ -24,20 +24,34 @@ if str(_ROOT) not in _sys.path:
     _sys.path.insert(0, str(_ROOT))
 
 
-import json
 import os
+import re
 import socket
 import sys
+import time
 from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from common.net import send_message, recv_message, send_raw, pick_python
+from common.codec import pack, unpack
+from common.net import send_message, recv_frame
+from common.term import clear_screen, enable_ansi
 
 SERVER_IP = "140.113.17.11"
 SERVER_PORT = 12088
+SENDFILE_CHUNK = 1 << 20  # minimum bytes handed to os.sendfile() per call
+UPLOAD_CHUNK = 1 << 16  # read size for the fallback read/send loop
+UPLOAD_SNDBUF = 4 << 20  # kernel send buffer for the upload data channel
+MY_GAMES_TTL = 5.0  # seconds a fetched "my games" list is reused across menus
+GAME_TYPES = frozenset({"CLI", "GUI"})
 
-def clear_screen() -> None:
-    os.system("cls" if os.name == "nt" else "clear")
+_POSITIVE_INT_RE = re.compile(r"\+?0*[1-9][0-9]*")
 
+# Control-channel socket options: the JSON requests are small and latency
+# sensitive, so disable Nagle; keepalive lets a dead lobby connection surface.
+CONTROL_SOCK_OPTS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
 
 def read_line(prompt: str = "") -> str:
     if prompt:
@@ -56,12 +70,46 @@ def file_size(path: Path) -> int:
         return -1
 
 
-def connect_server(ip: str, port: int) -> socket.socket:
+def connect_server(ip: str, port: int, sock_opts: Sequence[Tuple[int, int, int]] = CONTROL_SOCK_OPTS) -> socket.socket:
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.connect((ip, port))
+    for level, opt, value in sock_opts:
+        s.setsockopt(level, opt, value)
     return s
 
 
+def _stream_file(data_sock: socket.socket, f: BinaryIO, total: int) -> Iterator[int]:
+    """Push `total` bytes of `f` into data_sock, yielding the size of each piece sent.
+
+    os.sendfile() copies page-cache pages straight into the socket buffer, so the
+    file never passes through user space. Platforms without it (e.g. Windows)
+    fall back to a plain read/send loop.
+    """
+    # Resolve both descriptors once, and never split the file finer than 1% of
+    # its size: progress is shown in whole percent, so more calls buy nothing.
+    out_fd, in_fd = data_sock.fileno(), f.fileno()
+    piece = max(SENDFILE_CHUNK, total // 100)
+    sent = 0
+    try:
+        while sent < total:
+            n = os.sendfile(out_fd, in_fd, sent, min(piece, total - sent))
+            if n == 0:
+                return
+            sent += n
+            yield n
+        return
+    except (AttributeError, OSError):
+        if sent:
+            raise
+
+    while True:
+        buf = f.read(UPLOAD_CHUNK)
+        if not buf:
+            return
+        data_sock.sendall(buf)
+        yield len(buf)
+
+
 def send_file(ip: str, port: int, src: Path, total: int) -> bool:
     '''
     Upload a file to the server's data-channel port.
@@ -70,36 +118,69 @@ def send_file(ip: str, port: int, src: Path, total: int) -> bool:
     stream the file as raw bytes (no JSON framing) until EOF.
     '''
     data_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # A large send buffer lets each sendfile() call queue more data per syscall
+    # (set before connect so the TCP window scale is negotiated accordingly).
+    data_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, UPLOAD_SNDBUF)
     try:
         data_sock.connect((ip, port))
     except Exception:
         return False
 
     sent = 0
+    # Only touch the terminal when the displayed percentage actually changes.
+    bytes_per_pct = max(1, total // 100)
+    next_report = 0
+    last_pct = -1
     try:
         with data_sock:
             with open(src, "rb") as f:
-                while True:
-                    buf = f.read(4096)
-                    if not buf:
-                        break
-                    send_raw(data_sock, buf)
-                    sent += len(buf)
-                    if total > 0:
-                        pct = int(sent * 100 / total)
-                        print(f"\r[System] Uploading: {pct}%", end="", flush=True)
+                for n in _stream_file(data_sock, f, total):
+                    sent += n
+                    if sent < next_report:
+                        continue
+                    pct = sent * 100 // total
+                    if pct != last_pct:
+                        sys.stdout.write(f"\r[System] Uploading: {pct}%")
+                        sys.stdout.flush()
+                        last_pct = pct
+                    next_report = (pct + 1) * bytes_per_pct
         print()
         return sent == total
     except Exception:
         return False
 
 
-def fetch_my_games(sock: socket.socket, username: str):
-    send_message(sock, json.dumps({"action": "list_games"}, ensure_ascii=False))
-    res = json.loads(recv_message(sock))
+# (username, fetched_at, games) of the last successful fetch_my_games() call.
+_my_games_cache: Optional[Tuple[str, float, List[Dict[str, Any]]]] = None
+
+
+def invalidate_my_games() -> None:
+    """Drop the cached game list (call after anything that changes it)."""
+    global _my_games_cache
+    _my_games_cache = None
+
+
+def fetch_my_games(sock: socket.socket, username: str, ttl: float = MY_GAMES_TTL):
+    global _my_games_cache
+    now = time.monotonic()
+    if _my_games_cache and _my_games_cache[0] == username and now - _my_games_cache[1] < ttl:
+        return list(_my_games_cache[2])
+
+    # Ask the server to filter by developer so we don't download and parse the whole store.
+    send_message(sock, pack({"action": "list_games", "dev": username}))
+    res = unpack(recv_frame(sock))
     if res.get("status") != "ok":
         return []
-    return [g for g in res.get("data", []) if g.get("dev") == username]
+    games = [g for g in res.get("data", []) if g.get("dev") == username]
+    _my_games_cache = (username, now, games)
+    return list(games)
+
+
+def print_game_menu(games: List[Dict[str, Any]]) -> None:
+    """Print a numbered game menu (plus '0. Cancel') with a single write."""
+    lines = [f"{i}. {g.get('name')} (Ver: {g.get('version','1.0')})" for i, g in enumerate(games, 1)]
+    lines.append("0. Cancel")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def prompt_required(label: str) -> str:
@@ -110,24 +191,20 @@ def prompt_required(label: str) -> str:
         print("[Warning] 不能留空，請再輸入一次。")
 
 
-def prompt_choice(label: str, allowed: set[str]) -> str:
-    allowed_up = {x.upper() for x in allowed}
+def prompt_choice(label: str, allowed: frozenset[str]) -> str:
+    """Prompt until the (upper-cased) input is one of `allowed` (upper-case values)."""
     while True:
         v = prompt_required(label).upper()
-        if v in allowed_up:
+        if v in allowed:
             return v
-        print(f"[Warning] 請輸入：{', '.join(sorted(allowed_up))}")
+        print(f"[Warning] 請輸入：{', '.join(sorted(allowed))}")
 
 
 def prompt_positive_int(label: str) -> int:
     while True:
         v = prompt_required(label)
-        try:
-            n = int(v)
-            if n > 0:
-                return n
-        except Exception:
-            pass
+        if _POSITIVE_INT_RE.fullmatch(v):
+            return int(v)
         print("[Warning] 請輸入 > 0 的整數。")
 
 
@@ -143,9 +220,7 @@ def do_upload(sock: socket.socket, server_ip: str, username: str, is_new: bool)
             print("[Info] 你沒有可更新的遊戲。\nPress Enter...")
             read_line()
             return
-        for i, g in enumerate(my_games, 1):
-            print(f"{i}. {g.get('name')} (Ver: {g.get('version','1.0')})")
-        print("0. Cancel")
+        print_game_menu(my_games)
         sel = read_line("Select: ")
         if sel.strip() == "0" or not sel.strip():
             return
@@ -158,7 +233,7 @@ def do_upload(sock: socket.socket, server_ip: str, username: str, is_new: bool)
             return
 
     version = prompt_required("Version (e.g., 1.0): ")
-    game_type = prompt_choice("Game Type (CLI/GUI): ", {"CLI", "GUI"})
+    game_type = prompt_choice("Game Type (CLI/GUI): ", GAME_TYPES)
     max_players = prompt_positive_int("Max Players (e.g., 2): ")
     desc = prompt_required("Description: ")
 
@@ -189,14 +264,17 @@ def do_upload(sock: socket.socket, server_ip: str, username: str, is_new: bool)
         "filename": filename,
         "filesize": size,
     }
-    send_message(sock, json.dumps(req, ensure_ascii=False))
-    res = json.loads(recv_message(sock))
+    send_message(sock, pack(req))
+    res = unpack(recv_frame(sock))
     if res.get("status") != "ok":
         print("[Error] " + res.get("message", "Unknown"))
         print("Press Enter...")
         read_line()
         return
 
+    # The server records the new metadata as soon as it accepts the request.
+    invalidate_my_games()
+
     port = int(res["port"])
     print(f"[System] Connecting to data channel port {port}...")
     ok = send_file(server_ip, port, src, size)
@@ -217,9 +295,7 @@ def do_remove(sock: socket.socket, username: str) -> None:
         read_line()
         return
 
-    for i, g in enumerate(my_games, 1):
-        print(f"{i}. {g.get('name')} (Ver: {g.get('version','1.0')})")
-    print("0. Cancel")
+    print_game_menu(my_games)
     sel = read_line("Select: ")
     if sel.strip() == "0" or not sel.strip():
         return
@@ -233,9 +309,10 @@ def do_remove(sock: socket.socket, username: str) -> None:
     if confirm.strip().lower() != "yes":
         return
 
-    send_message(sock, json.dumps({"action": "delete_game", "gamename": gamename}, ensure_ascii=False))
-    res = json.loads(recv_message(sock))
+    send_message(sock, pack({"action": "delete_game", "gamename": gamename}))
+    res = unpack(recv_frame(sock))
     if res.get("status") == "ok":
+        invalidate_my_games()
         print("[Success] " + res.get("message", ""))
     else:
         print("[Error] " + res.get("message", "Unknown"))
@@ -249,8 +326,10 @@ def do_list_my(sock: socket.socket, username: str) -> None:
     my_games = fetch_my_games(sock, username)
     if not my_games:
         print("(No games)")
-    for g in my_games:
-        print(f"Name: {g.get('name')}\nVersion: {g.get('version','1.0')}\nFile: {g.get('filename','')}\nDesc: {g.get('description','')}\n--------------------")
+    sys.stdout.write("".join(
+        f"Name: {g.get('name')}\nVersion: {g.get('version','1.0')}\nFile: {g.get('filename','')}\nDesc: {g.get('description','')}\n--------------------\n"
+        for g in my_games
+    ))
     print("Press Enter...")
     read_line()
 
@@ -260,6 +339,7 @@ def main() -> None:
     server_ip = SERVER_IP
     server_port = SERVER_PORT
 
+    enable_ansi()
     sock = connect_server(server_ip, server_port)
     username = ""
 
@@ -277,15 +357,15 @@ def main() -> None:
                 if sel == "1":
                     u = prompt_required("Username: ")
                     p = prompt_required("Password: ")
-                    send_message(sock, json.dumps({"action": "register", "username": u, "password": p, "role": "developer"}, ensure_ascii=False))
-                    res = json.loads(recv_message(sock))
+                    send_message(sock, pack({"action": "register", "username": u, "password": p, "role": "developer"}))
+                    res = unpack(recv_frame(sock))
                     print(res.get("message", res.get("status")))
                     read_line("Press Enter...")
                 elif sel == "2":
                     u = prompt_required("Username: ")
                     p = prompt_required("Password: ")
-                    send_message(sock, json.dumps({"action": "login", "username": u, "password": p, "role": "developer"}, ensure_ascii=False))
-                    res = json.loads(recv_message(sock))
+                    send_message(sock, pack({"action": "login", "username": u, "password": p, "role": "developer"}))
+                    res = unpack(recv_frame(sock))
                     if res.get("status") == "ok" and res.get("role") == "developer":
                         username = u
                     else:
@@ -312,8 +392,8 @@ def main() -> None:
             elif sel == "4":
                 do_remove(sock, username)
             elif sel == "5":
-                send_message(sock, json.dumps({"action": "logout"}, ensure_ascii=False))
-                _ = recv_message(sock)
+                send_message(sock, pack({"action": "logout"}))
+                recv_frame(sock)  # consume the reply
                 username = ""
             elif sel == "0":
                 return
@@ -13,33 +13,87 @@ This is a simple reference implementation used during development.
 
 import argparse
 import json
+import selectors
 import socket
 import struct
-from dataclasses import dataclass
-from typing import Any, Dict, List
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
 
 # =========================
 # Protocol: length-prefixed JSON
 # =========================
 
+# Shared encoder/decoder instances (compact separators, no per-call setup).
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+_decode = json.JSONDecoder().decode
+
+def encode_json(obj: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """Encode obj as a (length prefix, payload) frame, reusable across recipients."""
+    data = _encode(obj).encode("utf-8")
+    return struct.pack("!I", len(data)), data
+
+def send_frame(sock: socket.socket, frame: Tuple[bytes, bytes]) -> None:
+    """Send prefix + payload with one gather write instead of concatenating them."""
+    hdr, data = frame
+    if not hasattr(sock, "sendmsg"):  # e.g. Windows
+        sock.sendall(hdr + data)
+        return
+    sent = sock.sendmsg(frame)
+    if sent < len(hdr):
+        sock.sendall(hdr[sent:])
+        sent = len(hdr)
+    if sent - len(hdr) < len(data):
+        sock.sendall(memoryview(data)[sent - len(hdr):])
+
 def send_json(sock: socket.socket, obj: Dict[str, Any]) -> None:
-    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
-    sock.sendall(struct.pack("!I", len(data)) + data)
+    send_frame(sock, encode_json(obj))
 
 def recv_exact(sock: socket.socket, n: int) -> bytes:
-    buf = b""
-    while len(buf) < n:
-        chunk = sock.recv(n - len(buf))
-        if not chunk:
+    # Receive straight into one preallocated buffer (no per-chunk bytes concat).
+    buf = bytearray(n)
+    mv = memoryview(buf)
+    off = 0
+    while off < n:
+        r = sock.recv_into(mv[off:], n - off)
+        if not r:
             raise ConnectionError("socket closed")
-        buf += chunk
-    return buf
+        off += r
+    return bytes(buf)
 
 def recv_json(sock: socket.socket) -> Dict[str, Any]:
     (length,) = struct.unpack("!I", recv_exact(sock, 4))
     data = recv_exact(sock, length)
-    return json.loads(data.decode("utf-8"))
+    return _decode(data.decode("utf-8"))
+
+def recv_ready(p: "PlayerConn") -> List[Dict[str, Any]]:
+    """Read what a readable player socket has and return every complete frame.
+
+    One recv_into() on a socket the selector reported readable never blocks. Data
+    lands in the player's reusable rxbuf; bytes of a frame that has not fully
+    arrived yet are moved to the front and kept until the next wakeup.
+    """
+    if p.rxlen == len(p.rxbuf):
+        p.rxbuf.extend(bytes(len(p.rxbuf)))  # a single frame larger than the buffer
+    mv = memoryview(p.rxbuf)
+    n = p.sock.recv_into(mv[p.rxlen:])
+    if not n:
+        raise ConnectionError("socket closed")
+    p.rxlen += n
+
+    msgs: List[Dict[str, Any]] = []
+    off = 0
+    while p.rxlen - off >= 4:
+        (length,) = struct.unpack_from("!I", p.rxbuf, off)
+        end = off + 4 + length
+        if end > p.rxlen:
+            break
+        msgs.append(_decode(str(mv[off + 4:end], "utf-8")))
+        off = end
+    if off:
+        mv[:p.rxlen - off] = mv[off:p.rxlen]
+        p.rxlen -= off
+    return msgs
 
 
 # =========================
@@ -48,6 +102,7 @@ def recv_json(sock: socket.socket) -> Dict[str, Any]:
 
 MAX_PLAYERS = 2
 GAME_NAME = "Rock Paper Scissors"
+RX_BUF_SIZE = 65536  # per-player receive buffer (grows if a frame is larger)
 
 
 @dataclass
@@ -55,23 +110,28 @@ class PlayerConn:
     sock: socket.socket
     addr: Any
     pid: int  # 0..MAX_PLAYERS-1
+    rxbuf: bytearray = field(default_factory=lambda: bytearray(RX_BUF_SIZE))  # reused receive buffer
+    rxlen: int = 0  # bytes of rxbuf currently holding unparsed data
 
 
 # =========================
 # 遊戲邏輯：猜拳（單局）
 # =========================
 
-VALID_MOVES = {"r": "rock", "p": "paper", "s": "scissors"}
-BEATS = {
-    "rock": "scissors",
-    "paper": "rock",
-    "scissors": "paper",
-}
+MOVE_ID = {"r": 0, "p": 1, "s": 2}
+NAMES = ("rock", "paper", "scissors")
+# OUTCOME[m0][m1] -> winning pid. A tie is awarded to P0, as in the original rules.
+OUTCOME = (
+    (0, 1, 0),
+    (0, 0, 1),
+    (1, 0, 0),
+)
 
 class GameLogic:
     def __init__(self, n_players: int):
         self.n = n_players
-        self.moves: Dict[int, str] = {}  # pid -> move
+        self.moves: List[Optional[int]] = [None] * n_players  # pid -> move id
+        self.received = 0
         self.finished = False
 
     def apply_action(self, pid: int, action: Dict[str, Any]) -> Dict[str, Any]:
@@ -81,55 +141,37 @@ class GameLogic:
         if action.get("type") != "move":
             return {"type": "error", "message": "unknown action"}
 
-        raw = str(action.get("value", "")).strip().lower()
-        if raw not in VALID_MOVES:
+        mid = MOVE_ID.get(str(action.get("value", "")).strip().lower())
+        if mid is None:
             return {"type": "error", "message": "invalid move (use r/p/s)"}
 
-        if pid in self.moves:
+        if self.moves[pid] is not None:
             return {"type": "ignored", "reason": "already_moved"}
 
-        self.moves[pid] = VALID_MOVES[raw]
+        self.moves[pid] = mid
+        self.received += 1
 
-        if len(self.moves) < self.n:
+        if self.received < self.n:
             return {
                 "type": "state",
-                "received": len(self.moves),
-                "waiting": self.n - len(self.moves),
+                "received": self.received,
+                "waiting": self.n - self.received,
             }
 
         # 結算（單局）
         self.finished = True
-        p0 = self.moves.get(0)
-        p1 = self.moves.get(1)
-
-        '''
-        if p0 == p1:
-            winner = -1  # tie
-            reason = "tie"
-        elif BEATS[p0] == p1:
-            winner = 0
-            reason = f"{p0} beats {p1}"
-        else:
-            winner = 1
-            reason = f"{p1} beats {p0}"
-        '''
-
-        if p0 == p1:
-            winner = 0  # tie
-            reason = f"{p0} beats {p1}"
-        elif BEATS[p0] == p1:
-            winner = 0
-            reason = f"{p0} beats {p1}"
+        m0, m1 = self.moves[0], self.moves[1]
+        winner = OUTCOME[m0][m1]
+        if winner == 0:
+            reason = f"{NAMES[m0]} beats {NAMES[m1]}"
         else:
-            winner = 1
-            reason = f"{p1} beats {p0}"
-
+            reason = f"{NAMES[m1]} beats {NAMES[m0]}"
 
         # 這裡「不直接把對方出的拳顯示在過程中」，只在結果公布
         return {
             "type": "result",
             "winner": winner,
-            "moves": self.moves,
+            "moves": {i: NAMES[m] for i, m in enumerate(self.moves)},
             "reason": reason,
         }
 
@@ -148,6 +190,7 @@ def run_server(port: int) -> None:
     listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     listener.bind(("0.0.0.0", port))
     listener.listen()
+    sel = selectors.DefaultSelector()
 
     try:
         # 1) Accept connections until the room is full
@@ -163,43 +206,53 @@ def run_server(port: int) -> None:
             send_json(p.sock, {"type": "start", "pid": p.pid, "n_players": MAX_PLAYERS})
 
         # 3) Main loop: receive actions -> update game state -> broadcast events
+        # A single selector wait replaces per-socket timeout polling: we only wake up
+        # when some player actually sent data.
+        for p in players:
+            sel.register(p.sock, selectors.EVENT_READ, data=p)
+
         while not logic.finished:
-            for p in players:
+            for key, _ in sel.select(timeout=None):
+                p = key.data
                 try:
-                    p.sock.settimeout(0.2)
-                    msg = recv_json(p.sock)
-                except socket.timeout:
-                    continue
+                    msgs = recv_ready(p)
                 except Exception:
                     print("[Server] player disconnected, ending game.")
                     logic.finished = True
                     break
 
-                if msg.get("type") != "action":
-                    continue
+                for msg in msgs:
+                    if msg.get("type") != "action":
+                        continue
 
-                event = logic.apply_action(p.pid, msg.get("action", {}))
+                    event = logic.apply_action(p.pid, msg.get("action", {}))
 
-                # Broadcast the event to every connected client
-                for q in players:
-                    try:
-                        send_json(q.sock, {"type": "event", "event": event})
-                    except Exception:
-                        pass
+                    # Broadcast the event to every connected client (encode once, send N times)
+                    frame = encode_json({"type": "event", "event": event})
+                    for q in players:
+                        try:
+                            send_frame(q.sock, frame)
+                        except Exception:
+                            pass
 
-                # If we produced a final result, end the match loop
-                if event.get("type") == "result":
-                    logic.finished = True
+                    # If we produced a final result, end the match loop
+                    if event.get("type") == "result":
+                        logic.finished = True
+                        break
+
+                if logic.finished:
                     break
 
         # 4) Cleanup: send 'end' so clients can exit cleanly back to the lobby
+        frame = encode_json({"type": "end"})
         for p in players:
             try:
-                send_json(p.sock, {"type": "end"})
+                send_frame(p.sock, frame)
             except Exception:
                 pass
 
     finally:
+        sel.close()
         try:
             listener.close()
         except Exception:
@@ -239,7 +292,7 @@ def run_client(ip: str, port: int) -> None:
                 print("Choose your move: r=rock, p=paper, s=scissors")
                 while True:
                     mv = input("> ").strip().lower()
-                    if mv in VALID_MOVES:
+                    if mv in MOVE_ID:
                         break
                     print("Invalid. Please input r / p / s.")
                 send_json(sock, {"type": "action", "action": {"type": "move", "value": mv}})
@@ -10,36 +10,98 @@ Run:
 """
 
 from __future__ import annotations
-import argparse, json, queue, socket, struct, threading, time
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+import argparse, json, queue, selectors, socket, struct, threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
 import tkinter as tk
 from tkinter import messagebox
 
 GAME_NAME = "Tic-Tac-Toe (GUI 2P)"
 MAX_PLAYERS = 2
+RX_BUF_SIZE = 4096  # per-player receive buffer (grows if a frame is larger)
 
 # -------------------------
 # JSON framing
 # -------------------------
+# Payload codec. Everything on the wire goes through _pack/_unpack, so the
+# encoding lives in one place; encoder/decoder objects are built once.
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_decoder = json.JSONDecoder()
+_HDR = struct.Struct("!I")  # 4-byte big-endian length prefix
+
+def _pack(obj: Dict[str, Any]) -> bytes:
+    return _encoder.encode(obj).encode("utf-8")
+
+def _unpack(data: Any) -> Dict[str, Any]:
+    return _decoder.decode(str(data, "utf-8"))
+
+def encode_frame(obj: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """Encode obj as a (length prefix, payload) frame, reusable across recipients."""
+    data = _pack(obj)
+    return _HDR.pack(len(data)), data
+
+def send_frame(sock: socket.socket, frame: Tuple[bytes, bytes]) -> None:
+    """Send prefix + payload with one gather write instead of concatenating them."""
+    hdr, data = frame
+    if not hasattr(sock, "sendmsg"):  # e.g. Windows
+        sock.sendall(hdr + data)
+        return
+    sent = sock.sendmsg(frame)
+    if sent < len(hdr):
+        sock.sendall(hdr[sent:])
+        sent = len(hdr)
+    if sent - len(hdr) < len(data):
+        sock.sendall(memoryview(data)[sent - len(hdr):])
+
 def send_json(sock: socket.socket, obj: Dict[str, Any]) -> None:
-    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
-    sock.sendall(struct.pack("!I", len(data)) + data)
-
-def recv_exact(sock: socket.socket, n: int) -> bytes:
-    buf = b""
-    while len(buf) < n:
-        chunk = sock.recv(n - len(buf))
-        if not chunk:
+    send_frame(sock, encode_frame(obj))
+
+def recv_exact(sock: socket.socket, n: int) -> bytearray:
+    # Receive straight into one preallocated buffer (no per-chunk bytes concat).
+    buf = bytearray(n)
+    mv = memoryview(buf)
+    off = 0
+    while off < n:
+        r = sock.recv_into(mv[off:], n - off)
+        if not r:
             raise ConnectionError("socket closed")
-        buf += chunk
+        off += r
     return buf
 
 def recv_json(sock: socket.socket) -> Dict[str, Any]:
-    (length,) = struct.unpack("!I", recv_exact(sock, 4))
+    (length,) = _HDR.unpack(recv_exact(sock, _HDR.size))
     data = recv_exact(sock, length)
-    return json.loads(data.decode("utf-8"))
+    return _unpack(data)
+
+def recv_ready(p: "PlayerConn") -> List[Dict[str, Any]]:
+    """Read what a readable player socket has and return every complete frame.
+
+    One recv_into() on a socket the selector reported readable never blocks. Bytes
+    of a frame that has not fully arrived yet stay in p.rxbuf until the next wakeup,
+    so a slow or split frame from one player never stalls the other.
+    """
+    if p.rxlen == len(p.rxbuf):
+        p.rxbuf.extend(bytes(len(p.rxbuf)))  # a single frame larger than the buffer
+    mv = memoryview(p.rxbuf)
+    n = p.sock.recv_into(mv[p.rxlen:])
+    if not n:
+        raise ConnectionError("socket closed")
+    p.rxlen += n
+
+    msgs: List[Dict[str, Any]] = []
+    off = 0
+    while p.rxlen - off >= _HDR.size:
+        (length,) = _HDR.unpack_from(p.rxbuf, off)
+        end = off + _HDR.size + length
+        if end > p.rxlen:
+            break
+        msgs.append(_unpack(mv[off + _HDR.size:end]))
+        off = end
+    if off:
+        mv[:p.rxlen - off] = mv[off:p.rxlen]
+        p.rxlen -= off
+    return msgs
 
 # -------------------------
 # Game logic
@@ -49,23 +111,35 @@ WIN_LINES = [
     (0,3,6),(1,4,7),(2,5,8),
     (0,4,8),(2,4,6),
 ]
+# Bitboard form of WIN_LINES: bit i is cell i, a side wins if it owns all bits of a mask.
+WIN_MASKS = tuple((1 << a) | (1 << b) | (1 << c) for a, b, c in WIN_LINES)
+# CELL_MASKS[i]: only the lines through cell i (2-4 of them) can be completed by a move there.
+CELL_MASKS = tuple(tuple(m for m in WIN_MASKS if m >> i & 1) for i in range(9))
 
 class GameLogic:
     def __init__(self):
-        self.board = [""] * 9  # "" | "X" | "O"
+        self.x_bits = 0        # bit i set -> X on cell i
+        self.o_bits = 0        # bit i set -> O on cell i
+        self.move_count = 0
         self.turn = 0          # pid 0 or 1
         self.finished = False
         self.winner: Optional[int] = None  # None means draw or not finished
         self.last_move: Optional[Dict[str, Any]] = None
 
-    def _check_winner_symbol(self) -> Optional[str]:
-        for a,b,c in WIN_LINES:
-            if self.board[a] and self.board[a] == self.board[b] == self.board[c]:
-                return self.board[a]
-        return None
+    @property
+    def board(self) -> List[str]:
+        """Board as "" | "X" | "O" cells (the wire format clients expect)."""
+        return ["X" if self.x_bits >> i & 1 else "O" if self.o_bits >> i & 1 else "" for i in range(9)]
+
+    def _check_winner_at(self, idx: int, bits: int) -> bool:
+        """True if the side owning `bits` completed a line through cell idx."""
+        for m in CELL_MASKS[idx]:
+            if bits & m == m:
+                return True
+        return False
 
     def _is_full(self) -> bool:
-        return all(cell != "" for cell in self.board)
+        return self.move_count == 9
 
     def state_event(self) -> Dict[str, Any]:
         return {
@@ -77,6 +151,19 @@ class GameLogic:
             "last_move": self.last_move
         }
 
+    def delta_event(self) -> Dict[str, Any]:
+        """Incremental update after a move: clients patch last_move into their board.
+
+        The full board only goes out once, in the initial state_event().
+        """
+        return {
+            "type": "delta",
+            "turn": self.turn,
+            "finished": self.finished,
+            "winner": self.winner,
+            "last_move": self.last_move
+        }
+
     def apply_action(self, pid: int, action: Dict[str, Any]) -> Dict[str, Any]:
         if self.finished:
             return {"type": "ignored", "reason": "already_finished"}
@@ -95,24 +182,33 @@ class GameLogic:
         if not (0 <= idx <= 8):
             return {"type": "error", "message": "index out of range"}
 
-        if self.board[idx] != "":
+        bit = 1 << idx
+        if (self.x_bits | self.o_bits) & bit:
             return {"type": "error", "message": "cell already occupied"}
 
-        sym = "X" if pid == 0 else "O"
-        self.board[idx] = sym
+        if pid == 0:
+            sym = "X"
+            self.x_bits |= bit
+            mine = self.x_bits
+        else:
+            sym = "O"
+            self.o_bits |= bit
+            mine = self.o_bits
+        self.move_count += 1
         self.last_move = {"pid": pid, "symbol": sym, "index": idx}
 
-        ws = self._check_winner_symbol()
-        if ws is not None:
+        # Only the player who just moved can have won, and only on a line through idx.
+        # No line can be complete before X's third move (5 moves total).
+        if self.move_count >= 5 and self._check_winner_at(idx, mine):
             self.finished = True
-            self.winner = 0 if ws == "X" else 1
+            self.winner = pid
         elif self._is_full():
             self.finished = True
             self.winner = None  # draw
         else:
             self.turn = 1 - self.turn
 
-        return self.state_event()
+        return self.delta_event()
 
 # -------------------------
 # Server
@@ -122,6 +218,8 @@ class PlayerConn:
     sock: socket.socket
     addr: Any
     pid: int
+    rxbuf: bytearray = field(default_factory=lambda: bytearray(RX_BUF_SIZE))  # reused receive buffer
+    rxlen: int = 0  # bytes of rxbuf currently holding unparsed data
 
 def run_server(port: int) -> None:
     print(f"[{GAME_NAME}] Server on port {port}, waiting for 2 players...")
@@ -133,11 +231,13 @@ def run_server(port: int) -> None:
     listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     listener.bind(("0.0.0.0", port))
     listener.listen()
+    sel = selectors.DefaultSelector()
 
     def broadcast(obj: Dict[str, Any]) -> None:
+        frame = encode_frame(obj)  # encode once, same bytes for every player
         for p in players:
             try:
-                send_json(p.sock, obj)
+                send_frame(p.sock, frame)
             except Exception:
                 pass
 
@@ -154,42 +254,45 @@ def run_server(port: int) -> None:
 
         broadcast({"type": "event", "event": logic.state_event()})
 
+        # Block until some player actually sent something instead of polling
+        # each socket with a short timeout.
+        for p in players:
+            sel.register(p.sock, selectors.EVENT_READ, data=p)
+
         while not logic.finished:
-            progressed = False
-            for p in players:
+            for key, _ in sel.select(timeout=None):
+                p = key.data
                 try:
-                    p.sock.settimeout(0.2)
-                    msg = recv_json(p.sock)
-                except socket.timeout:
-                    continue
+                    msgs = recv_ready(p)
                 except Exception:
                     logic.finished = True
                     logic.winner = None
                     break
 
-                if msg.get("type") != "action":
-                    continue
+                for msg in msgs:
+                    if msg.get("type") != "action":
+                        continue
 
-                ev = logic.apply_action(p.pid, msg.get("action", {}))
+                    ev = logic.apply_action(p.pid, msg.get("action", {}))
 
-                if ev.get("type") == "error":
-                    try:
-                        send_json(p.sock, {"type": "event", "event": ev})
-                    except Exception:
-                        pass
-                    continue
+                    if ev.get("type") == "error":
+                        try:
+                            send_json(p.sock, {"type": "event", "event": ev})
+                        except Exception:
+                            pass
+                        continue
 
-                broadcast({"type": "event", "event": ev})
-                progressed = True
-                if ev.get("finished"):
-                    break
+                    broadcast({"type": "event", "event": ev})
+                    if ev.get("finished"):
+                        break
 
-            if not progressed:
-                time.sleep(0.05)
+                if logic.finished:
+                    break
 
         broadcast({"type": "end"})
 
     finally:
+        sel.close()
         try: listener.close()
         except Exception: pass
         for p in players:
@@ -246,6 +349,9 @@ class GuiClient:
                               font=("Arial", 14, "bold"))
                 b.grid(row=r, column=c, padx=4, pady=4)
                 self.btns.append(b)
+        # What the buttons currently show, so render() can skip unchanged cells.
+        self._prev_board: List[str] = [""] * 9
+        self._prev_states: List[Optional[str]] = [None] * 9
 
         self.lbl_status = tk.Label(self.root, text="", fg="blue")
         self.lbl_status.pack(pady=6)
@@ -255,19 +361,31 @@ class GuiClient:
         self.root.bind("<Return>", lambda _e: self.on_return())
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        threading.Thread(target=self.recv_loop, daemon=True).start()
-        self.root.after(50, self.ui_tick)
+        # The reader thread wakes the Tk loop with a virtual event per message
+        # instead of the UI polling the queue on a timer.
+        self.root.bind("<<NetMsg>>", lambda _e: self.ui_tick())
+
+        # event_generate from another thread needs the main loop running, so
+        # the reader only starts once mainloop() is processing callbacks.
+        self.root.after_idle(lambda: threading.Thread(target=self.recv_loop, daemon=True).start())
         self.render()
 
+    def post(self, msg: Dict[str, Any]) -> None:
+        self.q.put(msg)
+        try:
+            self.root.event_generate("<<NetMsg>>", when="tail")
+        except (tk.TclError, RuntimeError):
+            pass  # window destroyed / main loop already returned
+
     def recv_loop(self) -> None:
         try:
             while self.running:
                 msg = recv_json(self.sock)
-                self.q.put(msg)
+                self.post(msg)
                 if msg.get("type") == "end":
                     break
         except Exception:
-            self.q.put({"type": "disconnect"})
+            self.post({"type": "disconnect"})
         finally:
             self.running = False
 
@@ -295,6 +413,13 @@ class GuiClient:
                 if ev.get("type") == "state":
                     self.state.update(ev)
                     self.render()
+                elif ev.get("type") == "delta":
+                    mv = ev.get("last_move")
+                    if mv:
+                        self.state["board"][int(mv["index"])] = mv["symbol"]
+                    for k in ("turn", "finished", "winner", "last_move"):
+                        self.state[k] = ev.get(k)
+                    self.render()
                 elif ev.get("type") == "error":
                     self.lbl_status.config(text=f"[Error] {ev.get('message')}")
             elif msg.get("type") == "disconnect":
@@ -302,13 +427,14 @@ class GuiClient:
                 self.state["finished"] = True
                 self.render()
 
-        if self.running:
-            self.root.after(50, self.ui_tick)
-
     def render(self) -> None:
         board = self.state["board"]
+        # Only touch buttons whose text/state actually changed (each config() is a Tcl round-trip).
+        prev_board = self._prev_board
         for i in range(9):
-            self.btns[i].config(text=board[i])
+            if board[i] != prev_board[i]:
+                self.btns[i].config(text=board[i])
+                prev_board[i] = board[i]
 
         turn = int(self.state.get("turn", 0))
         self.lbl_turn.config(text=f"Turn: Player {turn} ({'X' if turn==0 else 'O'})")
@@ -340,9 +466,12 @@ class GuiClient:
 
         # 只有自己回合且未結束時可按
         my_turn = (turn == self.pid) and (not finished)
+        prev_states = self._prev_states
         for i in range(9):
             st = "normal" if (my_turn and board[i] == "") else "disabled"
-            self.btns[i].config(state=st)
+            if st != prev_states[i]:
+                self.btns[i].config(state=st)
+                prev_states[i] = st
 
     def on_return(self) -> None:
         if self.state.get("finished"):
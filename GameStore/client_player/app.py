@@ -25,24 +25,23 @@ if str(_ROOT) not in _sys.path:
     _sys.path.insert(0, str(_ROOT))
 
 
-import json
-import os
+import itertools
 import queue
 import socket
 import subprocess
 import sys
 import threading
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
-from common.net import send_message, recv_message, recv_raw_exact, pick_python
+from common.codec import pack, unpack
+from common.net import send_message, recv_frame, recv_raw_exact, pick_python
+from common.term import clear_screen, enable_ansi
 
 SERVER_IP = "140.113.17.11"
 SERVER_PORT = 12088
-
-
-def clear_screen() -> None:
-    os.system("cls" if os.name == "nt" else "clear")
+DOWNLOAD_CHUNK = 1 << 16    # bytes per recv on the download data socket
+DOWNLOAD_RCVBUF = 1 << 20   # SO_RCVBUF for the download data socket
 
 
 def read_line(prompt: str = "") -> str:
@@ -59,20 +58,88 @@ def user_dir(user: str) -> Path:
     return Path("client_player/downloads") / user
 
 
+# (user, game) -> installed version. The .ver files are only written through
+# save_version(), so the store page can read each one once per process.
+_ver_cache: Dict[Tuple[str, str], str] = {}
+
+
 def local_version(user: str, game_name: str) -> str:
+    key = (user, game_name)
+    cached = _ver_cache.get(key)
+    if cached is not None:
+        return cached
+    ver = "0.0"
     vp = user_dir(user) / f"{game_name}.ver"
     if vp.exists():
         try:
-            return vp.read_text(encoding="utf-8").strip() or "0.0"
+            ver = vp.read_text(encoding="utf-8").strip() or "0.0"
         except Exception:
-            return "0.0"
-    return "0.0"
+            ver = "0.0"
+    _ver_cache[key] = ver
+    return ver
 
 
 def save_version(user: str, game_name: str, ver: str) -> None:
     vp = user_dir(user) / f"{game_name}.ver"
     ensure_dir(vp.parent)
     vp.write_text(str(ver), encoding="utf-8")
+    _ver_cache[(user, game_name)] = str(ver)
+
+
+class ResponseSlot:
+    """Hand-off for one RPC response.
+
+    The reader thread drops the response into the slot and sets an Event;
+    the caller waits on that Event.
+    """
+
+    def __init__(self) -> None:
+        self._ready = threading.Event()
+        self._msg: Dict[str, Any] = {}
+
+    def put(self, msg: Dict[str, Any]) -> None:
+        self._msg = msg
+        self._ready.set()
+
+    def get(self) -> Dict[str, Any]:
+        self._ready.wait()
+        self._ready.clear()
+        return self._msg
+
+
+class PendingCalls:
+    """RPC requests in flight, keyed by req_id.
+
+    Every request is tagged with a fresh "req_id" which the server echoes in
+    its response, so several requests can be outstanding at once and each
+    response still reaches the caller waiting for it.
+    """
+
+    def __init__(self) -> None:
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._slots: Dict[int, ResponseSlot] = {}
+
+    def submit(self, sock: socket.socket, req: Dict[str, Any]) -> ResponseSlot:
+        """Send req without waiting; .get() on the returned slot yields the response."""
+        rid = next(self._ids)
+        slot = ResponseSlot()
+        with self._lock:
+            self._slots[rid] = slot
+        send_message(sock, pack({**req, "req_id": rid}))
+        return slot
+
+    def deliver(self, msg: Dict[str, Any]) -> None:
+        with self._lock:
+            rid = msg.get("req_id")
+            if rid in self._slots:
+                slot = self._slots.pop(rid)
+            elif self._slots:
+                # Untagged reply: the server answers in order, so it is the oldest request's.
+                slot = self._slots.pop(next(iter(self._slots)))
+            else:
+                return
+        slot.put(msg)
 
 
 class SocketRouter(threading.Thread):
@@ -82,43 +149,42 @@ class SocketRouter(threading.Thread):
     - Responses: contain a "status" field (reply to an RPC request)
     - Notifications: do not contain "status" (async pushes like game_start)
 
-    This thread continuously reads from the socket and routes messages into
-    the appropriate queue so the main thread can stay synchronous.
+    This thread continuously reads from the socket and routes responses to the
+    waiting PendingCalls slot and notifications into notif_q, so the main
+    thread can stay synchronous.
     """
 
-    def __init__(self, sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]", notif_q: "queue.Queue[Dict[str, Any]]"):
+    def __init__(self, sock: socket.socket, calls: PendingCalls, notif_q: "queue.Queue[Dict[str, Any]]"):
         super().__init__(daemon=True)
         self.sock = sock
-        self.resp_q = resp_q
+        self.calls = calls
         self.notif_q = notif_q
         self.alive = True
 
     def run(self) -> None:
         while self.alive:
             try:
-                msg = json.loads(recv_message(self.sock))
+                msg = unpack(recv_frame(self.sock))
             except Exception:
                 self.notif_q.put({"action": "_disconnected"})
                 break
 
             if "status" in msg:
-                self.resp_q.put(msg)
+                self.calls.deliver(msg)
             else:
                 self.notif_q.put(msg)
 
 
-def rpc(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]", req: Dict[str, Any]) -> Dict[str, Any]:
+def rpc(sock: socket.socket, calls: PendingCalls, req: Dict[str, Any]) -> Dict[str, Any]:
     '''
     Send one request and wait for its matching response.
-    Design note: this client keeps requests sequential (one in flight),
-    so the first response popped from resp_q belongs to the last request.
+    Use calls.submit() directly to keep several requests in flight.
     '''
-    send_message(sock, json.dumps(req, ensure_ascii=False))
-    return resp_q.get()  # sequential: one outstanding request at a time
+    return calls.submit(sock, req).get()
 
 
-def download_game(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]", server_ip: str, user: str, game_name: str, server_ver: str = "") -> bool:
-    res = rpc(sock, resp_q, {"action": "download_request", "gamename": game_name})
+def download_game(sock: socket.socket, calls: PendingCalls, server_ip: str, user: str, game_name: str, server_ver: str = "") -> bool:
+    res = rpc(sock, calls, {"action": "download_request", "gamename": game_name})
     if res.get("status") != "ok":
         print("[Error] Download failed:", res.get("message", "Unknown"))
         return False
@@ -132,6 +198,8 @@ def download_game(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]", se
     save_path = user_dir(user) / filename
 
     data_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Set before connect() so the larger window is negotiated on the handshake.
+    data_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, DOWNLOAD_RCVBUF)
     try:
         data_sock.connect((server_ip, port))
     except Exception:
@@ -139,16 +207,19 @@ def download_game(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]", se
         return False
 
     received = 0
+    last_pct = -1
     try:
         with data_sock:
             with open(save_path, "wb") as f:
                 while received < filesize:
-                    n = min(4096, filesize - received)
+                    n = min(DOWNLOAD_CHUNK, filesize - received)
                     buf = recv_raw_exact(data_sock, n)
                     f.write(buf)
                     received += n
-                    pct = int(received * 100 / filesize) if filesize else 100
-                    print(f"\rProgress: {pct}%", end="", flush=True)
+                    pct = received * 100 // filesize
+                    if pct != last_pct:  # redraw only when the percentage moves
+                        print(f"\rProgress: {pct}%", end="", flush=True)
+                        last_pct = pct
         print()
     except Exception:
         print("\n[Error] Download interrupted")
@@ -177,13 +248,13 @@ def launch_game_client(server_ip: str, port: int, user: str, filename: str) -> N
         print("[Error] Failed to start game:", e)
 
 
-def fetch_games(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]") -> List[Dict[str, Any]]:
-    res = rpc(sock, resp_q, {"action": "list_games"})
+def fetch_games(sock: socket.socket, calls: PendingCalls) -> List[Dict[str, Any]]:
+    res = rpc(sock, calls, {"action": "list_games"})
     return list(res.get("data", [])) if res.get("status") == "ok" else []
 
 
-def show_store(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]", server_ip: str, user: str) -> None:
-    games = fetch_games(sock, resp_q)
+def show_store(sock: socket.socket, calls: PendingCalls, server_ip: str, user: str) -> None:
+    games = fetch_games(sock, calls)
     while True:
         clear_screen()
         print("=== Game Store ===")
@@ -234,7 +305,7 @@ def show_store(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]", serve
             if a == "3":
                 break
             if a == "1":
-                download_game(sock, resp_q, server_ip, user, name, server_ver=str(g.get("version", "1.0")))
+                download_game(sock, calls, server_ip, user, name, server_ver=str(g.get("version", "1.0")))
                 read_line("Press Enter...")
             elif a == "2":
                 score_s = read_line("Rating (1-5 integer): ").strip()
@@ -242,15 +313,19 @@ def show_store(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]", serve
                     read_line("Invalid. Press Enter...")
                     continue
                 content = read_line("Comment (Enter to skip): ").strip() or "No comment"
-                res = rpc(sock, resp_q, {"action": "add_comment", "game_name": name, "score": int(score_s), "content": content})
+                # Pipeline the refresh behind the comment: both requests are in flight at once.
+                pending = calls.submit(sock, {"action": "add_comment", "game_name": name, "score": int(score_s), "content": content})
+                listing = calls.submit(sock, {"action": "list_games"})
+                res = pending.get()
                 print(res.get("message", res.get("status")))
-                games = fetch_games(sock, resp_q)
+                res = listing.get()
+                games = list(res.get("data", [])) if res.get("status") == "ok" else []
                 g = next((x for x in games if x.get("name") == name), g)
                 read_line("Press Enter...")
 
 
-def print_rooms(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]") -> None:
-    res = rpc(sock, resp_q, {"action": "list_rooms"})
+def print_rooms(sock: socket.socket, calls: PendingCalls) -> None:
+    res = rpc(sock, calls, {"action": "list_rooms"})
     rooms = res.get("data", []) if res.get("status") == "ok" else []
     print("\n=== Rooms ===")
     if not rooms:
@@ -259,8 +334,8 @@ def print_rooms(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]") -> N
         print(f"[{r.get('id')}] {r.get('name')} (Game: {r.get('game')}) - {r.get('status')} {r.get('players')}/{r.get('max_players')}")
 
 
-def print_players(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]") -> None:
-    res = rpc(sock, resp_q, {"action": "list_players"})
+def print_players(sock: socket.socket, calls: PendingCalls) -> None:
+    res = rpc(sock, calls, {"action": "list_players"})
     players = res.get("data", []) if res.get("status") == "ok" else []
     print("\n=== Online Players ===")
     if not players:
@@ -272,16 +347,18 @@ def print_players(sock: socket.socket, resp_q: "queue.Queue[Dict[str, Any]]") ->
 def main() -> None:
     # Hardcoded server address for this deployment (as requested).
     # If you need to change the lobby server address, update SERVER_IP/SERVER_PORT above.
+    enable_ansi()
     server_ip = SERVER_IP
     server_port = SERVER_PORT
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # small RPC frames, don't wait on Nagle
     sock.connect((server_ip, server_port))
 
-    resp_q: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    calls = PendingCalls()
     notif_q: "queue.Queue[Dict[str, Any]]" = queue.Queue()
 
-    router = SocketRouter(sock, resp_q, notif_q)
+    router = SocketRouter(sock, calls, notif_q)
     router.start()
 
     user = ""
@@ -317,7 +394,7 @@ def main() -> None:
                 launch_game_client(server_ip, port, user, filename)
                 # Game client returns here after it ends.
                 if state == "IN_ROOM" and str(room_data.get("host", "")) == user:
-                    _ = rpc(sock, resp_q, {"action": "finish_game"})
+                    _ = rpc(sock, calls, {"action": "finish_game"})
                 read_line("Press Enter to continue...")
             else:
                 # ignore unknown pushes
@@ -339,13 +416,13 @@ def main() -> None:
                 if sel == "1":
                     u = read_line("Username: ")
                     p = read_line("Password: ")
-                    res = rpc(sock, resp_q, {"action": "register", "username": u, "password": p, "role": "player"})
+                    res = rpc(sock, calls, {"action": "register", "username": u, "password": p, "role": "player"})
                     print(res.get("message", res.get("status")))
                     read_line("Press Enter...")
                 elif sel == "2":
                     u = read_line("Username: ")
                     p = read_line("Password: ")
-                    res = rpc(sock, resp_q, {"action": "login", "username": u, "password": p, "role": "player"})
+                    res = rpc(sock, calls, {"action": "login", "username": u, "password": p, "role": "player"})
                     if res.get("status") == "ok" and res.get("role") == "player":
                         user = u
                         state = "LOBBY"
@@ -368,20 +445,20 @@ def main() -> None:
                 sel = read_line("Select: ").strip()
 
                 if sel == "1":
-                    show_store(sock, resp_q, server_ip, user)
+                    show_store(sock, calls, server_ip, user)
                 elif sel == "2":
-                    clear_screen(); print_rooms(sock, resp_q); read_line("\nPress Enter...")
+                    clear_screen(); print_rooms(sock, calls); read_line("\nPress Enter...")
                 elif sel == "5":
-                    clear_screen(); print_players(sock, resp_q); read_line("\nPress Enter...")
+                    clear_screen(); print_players(sock, calls); read_line("\nPress Enter...")
                 elif sel == "3":
                     rname = read_line("Room Name: ").strip() or "Room"
                     gname = read_line("Game Name: ").strip()
-                    res = rpc(sock, resp_q, {"action": "create_room", "room_name": rname, "game_name": gname})
+                    res = rpc(sock, calls, {"action": "create_room", "room_name": rname, "game_name": gname})
                     if res.get("status") == "ok":
                         room_data = res.get("data", {})
                         state = "IN_ROOM"
                         # auto download
-                        download_game(sock, resp_q, server_ip, user, str(room_data.get("game", gname)))
+                        download_game(sock, calls, server_ip, user, str(room_data.get("game", gname)))
                     else:
                         print("[Error]", res.get("message", ""))
                         read_line("Press Enter...")
@@ -389,16 +466,16 @@ def main() -> None:
                     rid = read_line("Room ID: ").strip()
                     if not rid.isdigit():
                         continue
-                    res = rpc(sock, resp_q, {"action": "join_room", "room_id": int(rid)})
+                    res = rpc(sock, calls, {"action": "join_room", "room_id": int(rid)})
                     if res.get("status") == "ok":
                         room_data = res.get("data", {})
                         state = "IN_ROOM"
-                        download_game(sock, resp_q, server_ip, user, str(room_data.get("game", "")))
+                        download_game(sock, calls, server_ip, user, str(room_data.get("game", "")))
                     else:
                         print("[Error]", res.get("message", ""))
                         read_line("Press Enter...")
                 elif sel == "6":
-                    _ = rpc(sock, resp_q, {"action": "logout"})
+                    _ = rpc(sock, calls, {"action": "logout"})
                     user = ""
                     state = "LOGIN"
                     room_data = {}
@@ -430,14 +507,14 @@ def main() -> None:
                         print("[Info] 只有房主可以開始遊戲。")
                         read_line("Press Enter...")
                         continue
-                    res = rpc(sock, resp_q, {"action": "start_game"})
+                    res = rpc(sock, calls, {"action": "start_game"})
                     if res.get("status") == "error":
                         print("[Error]", res.get("message", ""))
                     else:
                         print(res.get("message", "ok"))
                     read_line("Press Enter...")
                 elif sel == "2":
-                    _ = rpc(sock, resp_q, {"action": "leave_room"})
+                    _ = rpc(sock, calls, {"action": "leave_room"})
                     state = "LOBBY"
                     room_data = {}
                 elif sel == "0":
@@ -13,46 +13,143 @@ from __future__ import annotations
 
 import argparse
 import json
-import queue
+import os
+import selectors
 import socket
 import struct
-import threading
-import time
-from dataclasses import dataclass
-from typing import Any, Dict, List
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
 import tkinter as tk
 from tkinter import messagebox
 
 GAME_NAME = "RPS (GUI 3P, 1 Round)"
 MAX_PLAYERS = 3
+RX_BUF_SIZE = 4096
+
+# Kernel keepalive: a silent/dead peer is reported after ~IDLE + INTVL*CNT seconds
+# (as a failed recv) instead of stalling the match forever.
+KEEPALIVE_IDLE = 5
+KEEPALIVE_INTVL = 2
+KEEPALIVE_CNT = 3
 
 MOVES = ["rock", "paper", "scissors"]
 BEATS = {"rock": "scissors", "paper": "rock", "scissors": "paper"}
+MOVES_SET = frozenset(MOVES)
+
+# Set of moves played -> (winning move or None, reason). Covers every possible
+# outcome, so settlement is a single lookup.
+SETTLE_TABLE: Dict[frozenset, Tuple[Optional[str], str]] = {
+    frozenset(MOVES): (None, "Tie (all three kinds)"),
+    **{frozenset((m,)): (None, "Tie (all same)") for m in MOVES},
+    **{frozenset((w, l)): (w, f"{w} wins") for w, l in BEATS.items()},
+}
 
 
 # -------------------------
 # JSON framing
 # -------------------------
+# Payload codec. Everything on the wire goes through _pack/_unpack, so the
+# encoding lives in one place; encoder/decoder objects are built once.
+# ensure_ascii keeps every payload pure ASCII (the protocol is ASCII anyway), so
+# encoding is a plain ASCII copy; decoding stays UTF-8, which accepts it as-is.
+_encoder = json.JSONEncoder(ensure_ascii=True, separators=(",", ":"))
+_decoder = json.JSONDecoder()
+_HDR = struct.Struct("!I")  # 4-byte big-endian length prefix
+
+
+def _pack(obj: Dict[str, Any]) -> bytes:
+    return _encoder.encode(obj).encode("ascii")
+
+
+def _unpack(data: bytes) -> Dict[str, Any]:
+    return _decoder.decode(str(data, "utf-8"))
+
+
+def encode_frame(obj: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """Encode obj as a (length prefix, payload) frame, reusable across recipients."""
+    data = _pack(obj)
+    return _HDR.pack(len(data)), data
+
+
+def send_frame(sock: socket.socket, frame: Tuple[bytes, bytes]) -> None:
+    """Send prefix + payload with one gather write instead of concatenating them."""
+    hdr, data = frame
+    if not hasattr(sock, "sendmsg"):  # e.g. Windows
+        sock.sendall(hdr + data)
+        return
+    sent = sock.sendmsg(frame)
+    if sent < len(hdr):
+        sock.sendall(hdr[sent:])
+        sent = len(hdr)
+    if sent - len(hdr) < len(data):
+        sock.sendall(memoryview(data)[sent - len(hdr):])
+
+
 def send_json(sock: socket.socket, obj: Dict[str, Any]) -> None:
-    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
-    sock.sendall(struct.pack("!I", len(data)) + data)
+    send_frame(sock, encode_frame(obj))
 
 
-def recv_exact(sock: socket.socket, n: int) -> bytes:
-    buf = b""
-    while len(buf) < n:
-        chunk = sock.recv(n - len(buf))
-        if not chunk:
+def enable_keepalive(sock: socket.socket) -> None:
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for opt, val in (("TCP_KEEPIDLE", KEEPALIVE_IDLE), ("TCP_KEEPINTVL", KEEPALIVE_INTVL), ("TCP_KEEPCNT", KEEPALIVE_CNT)):
+        if hasattr(socket, opt):  # Linux; other platforms keep the system timers
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, opt), val)
+            except OSError:
+                pass
+
+
+def recv_exact(sock: socket.socket, n: int) -> bytearray:
+    # Receive straight into one preallocated buffer (no per-chunk bytes concat).
+    buf = bytearray(n)
+    mv = memoryview(buf)
+    off = 0
+    while off < n:
+        r = sock.recv_into(mv[off:], n - off)
+        if not r:
             raise ConnectionError("socket closed")
-        buf += chunk
+        off += r
     return buf
 
 
 def recv_json(sock: socket.socket) -> Dict[str, Any]:
-    (length,) = struct.unpack("!I", recv_exact(sock, 4))
+    (length,) = _HDR.unpack(recv_exact(sock, _HDR.size))
     data = recv_exact(sock, length)
-    return json.loads(data.decode("utf-8"))
+    return _unpack(data)
+
+
+def recv_ready(c: Any) -> List[Dict[str, Any]]:
+    """Read what c.sock has and return every complete frame (never blocks).
+
+    c carries the connection's reusable receive buffer (c.rxbuf / c.rxlen).
+    Bytes of a frame that has not fully arrived yet are moved to the front
+    of rxbuf and kept until the next call.
+    """
+    if c.rxlen == len(c.rxbuf):
+        c.rxbuf.extend(bytes(len(c.rxbuf)))  # a single frame larger than the buffer
+    mv = memoryview(c.rxbuf)
+    try:
+        n = c.sock.recv_into(mv[c.rxlen:])
+    except (BlockingIOError, InterruptedError):
+        return []
+    if not n:
+        raise ConnectionError("socket closed")
+    c.rxlen += n
+
+    msgs: List[Dict[str, Any]] = []
+    off = 0
+    while c.rxlen - off >= _HDR.size:
+        (length,) = _HDR.unpack_from(c.rxbuf, off)
+        end = off + _HDR.size + length
+        if end > c.rxlen:
+            break
+        msgs.append(_unpack(mv[off + _HDR.size:end]))
+        off = end
+    if off:
+        mv[:c.rxlen - off] = mv[off:c.rxlen]
+        c.rxlen -= off
+    return msgs
 
 
 # -------------------------
@@ -61,9 +158,18 @@ def recv_json(sock: socket.socket) -> Dict[str, Any]:
 class GameLogic:
     def __init__(self, n_players: int):
         self.n = n_players
-        self.moves: Dict[int, str] = {}  # pid -> move
+        self.moves: List[Optional[str]] = [None] * n_players  # index = pid, None = no move yet
+        self.received = 0
         self.finished = False
 
+    def moves_list(self) -> List[Optional[str]]:
+        """Copy of the moves for an outgoing event.
+
+        JSON object keys are always strings, so a list keeps pids as plain
+        indices on the wire and is smaller than the {"0": ...} dict.
+        """
+        return list(self.moves)
+
     def apply_action(self, pid: int, action: Dict[str, Any]) -> Dict[str, Any]:
         if self.finished:
             return {"type": "ignored", "reason": "already_finished"}
@@ -72,37 +178,27 @@ class GameLogic:
             return {"type": "error", "message": "unknown action"}
 
         mv = str(action.get("value", "")).strip().lower()
-        if mv not in MOVES:
+        if mv not in MOVES_SET:
             return {"type": "error", "message": "invalid move (rock/paper/scissors)"}
 
-        if pid in self.moves:
+        if self.moves[pid] is not None:
             return {"type": "ignored", "reason": "already_moved"}
 
         self.moves[pid] = mv
+        self.received += 1
 
         # Do NOT reveal other players' moves before result.
-        if len(self.moves) < self.n:
-            return {"type": "state", "received": len(self.moves), "waiting": self.n - len(self.moves)}
+        if self.received < self.n:
+            return {"type": "state", "received": self.received, "waiting": self.n - self.received}
 
         # Settlement (single round)
         self.finished = True
-        kinds = set(self.moves.values())
-
-        if len(kinds) == 1:
-            winners: List[int] = []
-            reason = "Tie (all same)"
-        elif len(kinds) == 3:
-            winners = []
-            reason = "Tie (all three kinds)"
-        else:
-            a, b = list(kinds)
-            win_move = a if BEATS[a] == b else b
-            winners = [p for p, m in self.moves.items() if m == win_move]
-            reason = f"{win_move} wins"
+        win_move, reason = SETTLE_TABLE[frozenset(self.moves)]
+        winners = [p for p, m in enumerate(self.moves) if m == win_move] if win_move else []
 
         return {
             "type": "result",
-            "moves": self.moves,
+            "moves": self.moves_list(),
             "winners": winners,
             "reason": reason,
         }
@@ -116,6 +212,8 @@ class PlayerConn:
     sock: socket.socket
     addr: Any
     pid: int
+    rxbuf: bytearray = field(default_factory=lambda: bytearray(RX_BUF_SIZE))
+    rxlen: int = 0
 
 
 def run_server(port: int) -> None:
@@ -128,11 +226,13 @@ def run_server(port: int) -> None:
     listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     listener.bind(("0.0.0.0", port))
     listener.listen()
+    sel = selectors.DefaultSelector()
 
     def broadcast(obj: Dict[str, Any]) -> None:
+        frame = encode_frame(obj)  # encode once, same bytes for every player
         for p in players:
             try:
-                send_json(p.sock, obj)
+                send_frame(p.sock, frame)
             except Exception:
                 pass
 
@@ -141,55 +241,62 @@ def run_server(port: int) -> None:
         while len(players) < MAX_PLAYERS:
             sock, addr = listener.accept()
             sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            enable_keepalive(sock)
             pid = len(players)
             players.append(PlayerConn(sock=sock, addr=addr, pid=pid))
             print(f"[Server] Player {pid} connected from {addr}")
 
-        # 2) start
+        # 2) start: frames differ only by pid, the shared fields are built once
+        start_template = {"type": "start", "n_players": MAX_PLAYERS, "game": GAME_NAME}
         for p in players:
-            send_json(p.sock, {"type": "start", "pid": p.pid, "n_players": MAX_PLAYERS, "game": GAME_NAME})
+            send_json(p.sock, {**start_template, "pid": p.pid})
 
         # 3) loop until result
+        # One selector wait across all players: wake only when someone sent data,
+        # instead of polling each socket with a timeout.
+        for p in players:
+            sel.register(p.sock, selectors.EVENT_READ, data=p)
+
         while not logic.finished:
-            progressed = False
-            for p in players:
+            for key, _ in sel.select(timeout=None):
+                p = key.data
                 try:
-                    p.sock.settimeout(0.2)
-                    msg = recv_json(p.sock)
-                except socket.timeout:
-                    continue
+                    # One recv per wakeup; a frame split across segments is
+                    # buffered in p.rxbuf instead of blocking the loop.
+                    msgs = recv_ready(p)
                 except Exception:
                     # someone disconnected -> end as tie
                     logic.finished = True
-                    broadcast({"type": "event", "event": {"type": "result", "moves": logic.moves, "winners": [], "reason": "Disconnected"}})
+                    broadcast({"type": "event", "event": {"type": "result", "moves": logic.moves_list(), "winners": [], "reason": "Disconnected"}})
                     break
 
-                if msg.get("type") != "action":
-                    continue
+                for msg in msgs:
+                    if msg.get("type") != "action":
+                        continue
+
+                    ev = logic.apply_action(p.pid, msg.get("action", {}))
 
-                ev = logic.apply_action(p.pid, msg.get("action", {}))
+                    # error: only send to that client
+                    if ev.get("type") == "error":
+                        try:
+                            send_json(p.sock, {"type": "event", "event": ev})
+                        except Exception:
+                            pass
+                        continue
 
-                # error: only send to that client
-                if ev.get("type") == "error":
-                    try:
-                        send_json(p.sock, {"type": "event", "event": ev})
-                    except Exception:
-                        pass
-                    continue
+                    broadcast({"type": "event", "event": ev})
 
-                broadcast({"type": "event", "event": ev})
-                progressed = True
+                    if ev.get("type") == "result":
+                        break
 
-                if ev.get("type") == "result":
+                if logic.finished:
                     break
 
-            if not progressed:
-                time.sleep(0.05)
-
         # 4) end
         broadcast({"type": "end"})
 
     finally:
+        sel.close()
         try:
             listener.close()
         except Exception:
@@ -209,6 +316,7 @@ class GuiClient:
     def __init__(self, ip: str, port: int):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        enable_keepalive(self.sock)
         self.sock.connect((ip, port))
 
         start = recv_json(self.sock)
@@ -217,7 +325,11 @@ class GuiClient:
         self.pid = int(start["pid"])
         self.n_players = int(start.get("n_players", MAX_PLAYERS))
 
-        self.q: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        # Socket is read from the Tk loop itself (no reader thread / queue):
+        # non-blocking reads into rxbuf, partial frames kept until the next tick.
+        self.sock.setblocking(False)
+        self.rxbuf = bytearray(RX_BUF_SIZE)
+        self.rxlen = 0
         self.running = True
 
         self.state = {
@@ -258,21 +370,38 @@ class GuiClient:
         self.root.bind("<Return>", lambda _e: self.on_return())
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        threading.Thread(target=self.recv_loop, daemon=True).start()
-        self.root.after(50, self.ui_tick)
+        self._applied: Dict[str, Dict[str, Any]] = {}  # widget path -> options last set via _config
+
+        # On Unix, Tk watches the socket and calls ui_tick as soon as data arrives.
+        # Windows Tk has no file handlers, so it keeps the 50 ms timer.
+        self._fd = self.sock.fileno()
+        self._watching = os.name != "nt" and hasattr(self.root.tk, "createfilehandler")
+        if self._watching:
+            self.root.tk.createfilehandler(self._fd, tk.READABLE, lambda _fd, _mask: self.ui_tick())
+        else:
+            self.root.after(50, self.ui_tick)
         self.render()
 
-    def recv_loop(self) -> None:
+    def stop_watching(self) -> None:
+        if self._watching:
+            self._watching = False
+            try:
+                self.root.tk.deletefilehandler(self._fd)
+            except Exception:
+                pass
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """Messages received since the last call; a disconnect becomes a message."""
+        if not self.running:
+            return []
         try:
-            while self.running:
-                msg = recv_json(self.sock)
-                self.q.put(msg)
-                if msg.get("type") == "end":
-                    break
+            msgs = recv_ready(self)
         except Exception:
-            self.q.put({"type": "disconnect"})
-        finally:
             self.running = False
+            return [{"type": "disconnect"}]
+        if any(m.get("type") == "end" for m in msgs):
+            self.running = False
+        return msgs
 
     def send_move(self, mv: str) -> None:
         if self.state["phase"] != "choose":
@@ -280,20 +409,20 @@ class GuiClient:
         try:
             send_json(self.sock, {"type": "action", "action": {"type": "move", "value": mv}})
             self.state["phase"] = "waiting"
-            self.lbl_status.config(text=f"Sent: {mv}. Waiting others...")
+            self._config(self.lbl_status, text=f"Sent: {mv}. Waiting others...")
             for b in self.btns.values():
-                b.config(state="disabled")
+                self._config(b, state="disabled")
         except Exception:
-            self.lbl_status.config(text="Send failed (disconnected).")
+            self._config(self.lbl_status, text="Send failed (disconnected).")
             self.state["phase"] = "result"
 
     def ui_tick(self) -> None:
-        while True:
-            try:
-                msg = self.q.get_nowait()
-            except queue.Empty:
-                break
+        # Apply everything that arrived since the last tick, then render once.
+        dirty = False
+        error_text: Optional[str] = None
+        result_ev: Optional[Dict[str, Any]] = None
 
+        for msg in self.poll():
             t = msg.get("type")
 
             if t == "event":
@@ -303,47 +432,53 @@ class GuiClient:
                 if et == "state":
                     self.state["received"] = int(ev.get("received", 0))
                     self.state["waiting"] = int(ev.get("waiting", 0))
-                    self.render()
+                    dirty, error_text = True, None
 
                 elif et == "error":
-                    self.lbl_status.config(text=f"[Error] {ev.get('message')}")
                     # allow re-choose if error
                     self.state["phase"] = "choose"
-                    for b in self.btns.values():
-                        b.config(state="normal")
+                    dirty, error_text = True, f"[Error] {ev.get('message')}"
 
                 elif et == "result":
                     self.state["phase"] = "result"
                     self.state["result"] = ev
-                    self.render()
-                    if not getattr(self, "_shown_over", False):
-                        self._shown_over = True
-                        try:
-                            messagebox.showinfo("Game Over", self._result_text(ev))
-                        except Exception:
-                            pass
+                    dirty, error_text = True, None
+                    result_ev = ev
 
             elif t == "end":
                 self.state["end_received"] = True
                 # do not auto-close; wait Enter
-                self.render()
+                dirty, error_text = True, None
 
             elif t == "disconnect":
                 self.state["phase"] = "result"
-                self.state["result"] = {"type": "result", "moves": {}, "winners": [], "reason": "Disconnected"}
-                self.render()
+                self.state["result"] = {"type": "result", "moves": [], "winners": [], "reason": "Disconnected"}
+                dirty, error_text = True, None
+
+        if dirty:
+            self.render()
+        if error_text is not None:
+            self._config(self.lbl_status, text=error_text)
+        if result_ev is not None and not getattr(self, "_shown_over", False):
+            self._shown_over = True
+            try:
+                messagebox.showinfo("Game Over", self._result_text(result_ev))
+            except Exception:
+                pass
 
-        if self.running:
+        if not self.running:
+            self.stop_watching()  # a closed socket stays readable; stop the callbacks
+        elif not self._watching:
             self.root.after(50, self.ui_tick)
 
     def _result_text(self, ev: Dict[str, Any]) -> str:
-        moves = ev.get("moves", {})
+        moves = ev.get("moves") or []
         winners = ev.get("winners", [])
         reason = ev.get("reason", "")
 
         lines = ["========== RESULT =========="]
         for p in range(self.n_players):
-            mv = moves.get(str(p), moves.get(p, None))
+            mv = moves[p] if p < len(moves) else None
             lines.append(f"P{p}: {mv if mv is not None else '-'}")
         lines.append(f"Reason: {reason}")
         if winners:
@@ -359,29 +494,41 @@ class GuiClient:
             lines.append("🤝 Tie.")
         return "\n".join(lines)
 
+    def _config(self, widget: tk.Widget, **opts: Any) -> None:
+        """widget.config(**opts), skipping options that already have that value.
+
+        Every config() is a Tcl round-trip, and render() reapplies the same
+        texts/states on most updates.
+        """
+        applied = self._applied.setdefault(str(widget), {})
+        changed = {k: v for k, v in opts.items() if applied.get(k) != v}
+        if changed:
+            widget.config(**changed)
+            applied.update(changed)
+
     def render(self) -> None:
         if self.state["phase"] == "choose":
-            self.lbl_info.config(text="Choose one move (single round).")
-            self.lbl_status.config(text="")
+            self._config(self.lbl_info, text="Choose one move (single round).")
+            self._config(self.lbl_status, text="")
             for b in self.btns.values():
-                b.config(state="normal")
+                self._config(b, state="normal")
 
         elif self.state["phase"] == "waiting":
             rec = self.state.get("received", 0)
             wait = self.state.get("waiting", self.n_players)
-            self.lbl_info.config(text=f"Waiting... received={rec}, waiting={wait}")
+            self._config(self.lbl_info, text=f"Waiting... received={rec}, waiting={wait}")
             # buttons already disabled
 
         elif self.state["phase"] == "result":
             ev = self.state.get("result")
             if ev:
-                self.lbl_info.config(text="Game Over (single round).")
-                self.lbl_status.config(text=self._result_text(ev))
+                self._config(self.lbl_info, text="Game Over (single round).")
+                self._config(self.lbl_status, text=self._result_text(ev))
             else:
-                self.lbl_info.config(text="Game Over.")
-                self.lbl_status.config(text="No result.")
+                self._config(self.lbl_info, text="Game Over.")
+                self._config(self.lbl_status, text="No result.")
             for b in self.btns.values():
-                b.config(state="disabled")
+                self._config(b, state="disabled")
 
     def on_return(self) -> None:
         if self.state["phase"] == "result":
@@ -389,6 +536,7 @@ class GuiClient:
 
     def on_close(self) -> None:
         self.running = False
+        self.stop_watching()
         try:
             self.sock.close()
         except Exception:
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+"""common.codec
+
+Payload codec for the lobby control channel.
+
+Every control message is a JSON object carried inside a length-prefixed frame
+(see common.net). Encoding and decoding go through pack()/unpack() so the
+wire format is defined in one place; the encoder and decoder objects are
+created once at import instead of on every json.dumps()/json.loads() call.
+"""
+
+
+import json
+from typing import Any, Union
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_decoder = json.JSONDecoder()
+
+
+def pack(obj: Any) -> bytes:
+    """Serialize a control message to UTF-8 bytes ready for common.net.send_message."""
+    return _encoder.encode(obj).encode("utf-8")
+
+
+def unpack(data: Union[str, bytes, bytearray]) -> Any:
+    """Parse a control message produced by pack().
+
+    Raw frame payloads (common.net.recv_frame) are decoded as UTF-8 here.
+    """
+    if not isinstance(data, str):
+        data = str(data, "utf-8")
+    return _decoder.decode(data)
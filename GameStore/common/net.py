@@ -1,43 +1,105 @@
 from __future__ import annotations
 
+import functools
 import socket
 import struct
-from typing import Optional
+import sys
+from typing import List, Optional, Union
 
 MAX_MSG_SIZE = 65536
+_HDR = struct.Struct("!I")  # 4-byte big-endian length prefix
 
 
-def _recv_exact(sock: socket.socket, n: int) -> bytes:
-    """Receive exactly n bytes or raise ConnectionError."""
-    buf = bytearray()
-    while len(buf) < n:
-        chunk = sock.recv(n - len(buf))
-        if not chunk:
+def _recv_exact(sock: socket.socket, n: int) -> bytearray:
+    """Receive exactly n bytes or raise ConnectionError.
+
+    Reads land directly in one preallocated buffer via recv_into; the
+    bytearray is returned as-is (callers only decode/unpack/write it).
+    """
+    buf = bytearray(n)
+    mv = memoryview(buf)
+    off = 0
+    while off < n:
+        r = sock.recv_into(mv[off:], n - off)
+        if not r:
             raise ConnectionError("socket closed")
-        buf.extend(chunk)
-    return bytes(buf)
+        off += r
+    return buf
 
 
-def send_message(sock: socket.socket, message: str) -> None:
+def send_message(sock: socket.socket, message: Union[str, bytes]) -> None:
     """Send a single length-prefixed UTF-8 message on the control channel.
 
+Accepts either text or an already UTF-8 encoded payload (e.g. from common.codec.pack).
 The receiver must call recv_message() to decode the 4-byte length header and payload."""
-    data = message.encode("utf-8")
+    data = message.encode("utf-8") if isinstance(message, str) else message
+    if not (0 < len(data) <= MAX_MSG_SIZE):
+        raise ValueError("message size invalid")
+    hdr = _HDR.pack(len(data))
+    if not hasattr(sock, "sendmsg"):  # e.g. Windows
+        sock.sendall(hdr + data)
+        return
+    # Gather write: header and payload go out in one syscall without copying
+    # the payload into a new buffer.
+    sent = sock.sendmsg((hdr, data))
+    if sent < len(hdr):
+        sock.sendall(hdr[sent:])
+        sent = len(hdr)
+    if sent - len(hdr) < len(data):
+        sock.sendall(memoryview(data)[sent - len(hdr):])
+
+
+def encode_frame(message: Union[str, bytes]) -> bytes:
+    """Return the complete wire frame (length prefix + payload) for one message.
+
+For callers that queue outgoing bytes themselves, e.g. on non-blocking sockets."""
+    data = message.encode("utf-8") if isinstance(message, str) else message
     if not (0 < len(data) <= MAX_MSG_SIZE):
         raise ValueError("message size invalid")
-    sock.sendall(struct.pack("!I", len(data)) + data)
+    return _HDR.pack(len(data)) + data
+
+
+def split_frames(buf: bytearray) -> List[bytes]:
+    """Remove and return every complete frame payload at the front of buf.
+
+buf is a per-connection receive buffer that the caller appends raw socket data
+to; a trailing partial frame is left in place for the next call. Raises
+ValueError on an invalid announced length (drop the connection then)."""
+    out: List[bytes] = []
+    off = 0
+    while len(buf) - off >= _HDR.size:
+        (length,) = _HDR.unpack_from(buf, off)
+        if length == 0 or length > MAX_MSG_SIZE:
+            raise ValueError("invalid message length")
+        end = off + _HDR.size + length
+        if len(buf) < end:
+            break
+        out.append(bytes(buf[off + _HDR.size:end]))
+        off = end
+    if off:
+        del buf[:off]
+    return out
+
+
+def recv_frame(sock: socket.socket) -> bytearray:
+    """Receive a single length-prefixed message payload without decoding it.
+
+Raises if the peer closes the socket early or if the announced length is invalid.
+The length is checked before any payload is read or allocated; after a
+ValueError the stream is out of sync and the caller should drop the connection."""
+    hdr = _recv_exact(sock, _HDR.size)
+    (length,) = _HDR.unpack(hdr)
+    if length == 0 or length > MAX_MSG_SIZE:
+        raise ValueError("invalid message length")
+    return _recv_exact(sock, length)
 
 
 def recv_message(sock: socket.socket) -> str:
     """Receive a single length-prefixed UTF-8 message from the control channel.
 
-Raises if the peer closes the socket early or if the announced length is invalid."""
-    hdr = _recv_exact(sock, 4)
-    (length,) = struct.unpack("!I", hdr)
-    if length == 0 or length > MAX_MSG_SIZE:
-        raise ValueError("invalid message length")
-    data = _recv_exact(sock, length)
-    return data.decode("utf-8", errors="replace")
+Raises if the peer closes the socket early, if the announced length is invalid,
+or if the payload is not valid UTF-8 (UnicodeDecodeError)."""
+    return recv_frame(sock).decode("utf-8")
 
 
 def send_raw(sock: socket.socket, data: bytes) -> None:
@@ -45,13 +107,13 @@ def send_raw(sock: socket.socket, data: bytes) -> None:
     sock.sendall(data)
 
 
-def recv_raw_exact(sock: socket.socket, n: int) -> bytes:
+def recv_raw_exact(sock: socket.socket, n: int) -> bytearray:
     """Receive exactly n raw bytes (used for file transfer sockets)."""
     return _recv_exact(sock, n)
 
 
+@functools.lru_cache(maxsize=1)
 def pick_python() -> str:
-    """Return a python executable name likely to work."""
+    """Return a python executable name likely to work (resolved once per process)."""
     # Prefer the current interpreter.
-    import sys
     return sys.executable or "python3"
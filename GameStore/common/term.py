@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+"""common.term
+
+Terminal helpers shared by the CLI clients.
+"""
+
+
+import os
+import sys
+
+_CLEAR_SCREEN = "\x1b[H\x1b[2J\x1b[3J"  # cursor home, clear screen, clear scrollback
+
+
+def enable_ansi() -> None:
+    # Windows consoles only honour ANSI escapes once VT processing is on;
+    # an empty os.system() call switches it on for the current console.
+    if os.name == "nt":
+        os.system("")
+
+
+def clear_screen() -> None:
+    # Write the escape sequence ourselves instead of forking a `clear` shell per redraw.
+    sys.stdout.write(_CLEAR_SCREEN)
+    sys.stdout.flush()
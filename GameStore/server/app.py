@@ -12,7 +12,9 @@ Responsibilities
 - Store and serve uploaded game scripts from server/uploaded_games/.
 
 Transport
-- Control channel: length-prefixed UTF-8 JSON (see common.net).
+- Control channel: length-prefixed UTF-8 JSON (see common.net, common.codec). Client sockets
+  are non-blocking; each keeps a receive buffer for partial frames and a send
+  buffer drained on EVENT_WRITE, so a slow client never stalls the loop.
 - Data channel (upload/download): separate TCP connection sending raw file bytes.
 """
 
@@ -26,29 +28,38 @@ if str(_ROOT) not in _sys.path:
     _sys.path.insert(0, str(_ROOT))
 
 
-import json
 import os
 import socket
 import selectors
 import threading
 import subprocess
-import re
-from dataclasses import dataclass
+import string
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Optional, Any
+from typing import Callable, Dict, Optional, Any, Tuple, Union
 
-from common.net import send_message, recv_message, send_raw, recv_raw_exact, pick_python
+from common.codec import pack, unpack
+from common.net import encode_frame, split_frames, pick_python
 from server.db import Database
 from server.room import RoomManager
 
 SERVER_PORT = 12088  # Lobby server TCP port (control channel)
 UPLOAD_DIR = Path("server/uploaded_games")  # Where uploaded game scripts are stored on the server
+RECV_CHUNK = 65536            # bytes read per readiness event on a control socket
+MAX_PENDING_SEND = 1 << 20    # unsent bytes after which a client that stopped reading is dropped
+TRANSFER_CHUNK = 1 << 20      # upload read size on the data channel
+TRANSFER_SOCKBUF = 1 << 20    # SO_SNDBUF/SO_RCVBUF for data-channel sockets
+
+_SAFE_CHARS = frozenset(string.ascii_letters + string.digits + "_.-")
+_SAFE_TABLE = {c: (c if chr(c) in _SAFE_CHARS else ord("_")) for c in range(128)}
+
 
 def _safe_token(s: str) -> str:
     """Sanitize an arbitrary string so it is safe to use in filenames."""
-    s = (s or "").strip()
-    s = re.sub(r"[^A-Za-z0-9_.-]", "_", s)
-    return s[:80] or "x"
+    # Non-ASCII characters become "?" first, which the table then maps to "_".
+    s = (s or "").strip().encode("ascii", "replace").decode("ascii")
+    return s.translate(_SAFE_TABLE)[:80] or "x"
 
 def make_server_filename(game_name: str, dev_name: str, version: str, client_filename: str) -> str:
     """Generate a unique, safe filename for server storage."""
@@ -57,6 +68,15 @@ def make_server_filename(game_name: str, dev_name: str, version: str, client_fil
     return f"{_safe_token(game_name)}__{_safe_token(dev_name)}__v{_safe_token(version)}{ext}"
 
 
+def _set_transfer_buffers(sock: socket.socket) -> None:
+    """Enlarge kernel buffers on a data-channel listener (accepted sockets inherit them)."""
+    for opt in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, opt, TRANSFER_SOCKBUF)
+        except OSError:
+            pass
+
+
 @dataclass
 class ClientInfo:
     sock: socket.socket
@@ -64,17 +84,34 @@ class ClientInfo:
     username: str = ""
     role: str = ""
     room_id: int = -1
+    rxbuf: bytearray = field(default_factory=bytearray)  # received bytes not yet forming a frame
+    txbuf: bytearray = field(default_factory=bytearray)  # framed bytes the socket has not accepted yet
 
 
 class LobbyServer:
     def __init__(self, host: str = "0.0.0.0", port: int = SERVER_PORT):
         self.host = host
         self.port = port
+        # DefaultSelector is already the best available: epoll on Linux, kqueue on BSD/macOS.
         self.sel = selectors.DefaultSelector()
         self.clients: Dict[socket.socket, ClientInfo] = {}
         self.db = Database("database.json")
         self.rooms = RoomManager()
         self.sessions: Dict[str, ClientInfo] = {}
+        # room_id -> members keyed by socket, so room fan-out skips unrelated clients.
+        self.room_members: Dict[int, Dict[socket.socket, ClientInfo]] = {}
+        # role -> logged-in clients keyed by socket (e.g. for list_players).
+        self.clients_by_role: Dict[str, Dict[socket.socket, ClientInfo]] = {}
+        # Request being served: (socket, req_id). Responses to that socket echo
+        # req_id so clients can keep several requests in flight.
+        self._reply_to: Tuple[Optional[socket.socket], Any] = (None, None)
+        # Ordered background writer for bookkeeping the reply does not depend on,
+        # so a journal write or a snapshot holding the DB lock never stalls the loop.
+        self._db_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        # action name -> bound handler, e.g. "login" -> self._act_login.
+        self._handlers: Dict[str, Callable[[ClientInfo, Dict[str, Any]], None]] = {
+            name[len("_act_"):]: getattr(self, name) for name in dir(self) if name.startswith("_act_")
+        }
 
     def start(self) -> None:
         UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -89,22 +126,33 @@ class LobbyServer:
         self.sel.register(listener, selectors.EVENT_READ, data=None)
         print(f"Lobby Server (Python) running on {self.port}")
 
+        # Hot-loop lookups bound once.
+        select = self.sel.select
+        accept, flush, service = self._accept, self._flush, self._service
+        EVENT_READ, EVENT_WRITE = selectors.EVENT_READ, selectors.EVENT_WRITE
         try:
             while True:
                 # selectors lets us multiplex many client sockets in a single thread.
-                for key, _ in self.sel.select(timeout=None):
+                for key, mask in select(timeout=None):
                     if key.data is None:
-                        self._accept(key.fileobj)
-                    else:
-                        self._service(key)
+                        accept(key.fileobj)
+                        continue
+                    if mask & EVENT_WRITE:
+                        flush(key.data)
+                    if mask & EVENT_READ:
+                        service(key)
         except KeyboardInterrupt:
             print("\n[System] Server shutting down...")
         finally:
             self.sel.close()
+            self._db_writer.shutdown(wait=True)
+            self.db.close()
 
     def _accept(self, listener: socket.socket) -> None:
         conn, addr = listener.accept()
-        conn.setblocking(True)  # we do blocking reads inside handler
+        conn.setblocking(False)
+        # Control messages are small request/response frames; don't let Nagle hold them back.
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         info = ClientInfo(sock=conn)
         self.clients[conn] = info
         self.sel.register(conn, selectors.EVENT_READ, data=info)
@@ -119,8 +167,9 @@ class LobbyServer:
             self.sessions.pop(f"{info.role}:{info.username}", None)
 
         # leave room and notify
-        if info.room_id != -1 and info.username:
-            rid = info.room_id
+        rid = info.room_id
+        self._set_room(info, -1)
+        if rid != -1 and info.username:
             ret = self.rooms.leave_room(rid, info.username)
 
             if ret in (0, 1):
@@ -129,17 +178,13 @@ class LobbyServer:
                 else:
                     notify = {"action": "player_left", "username": info.username, "data": self.rooms.get_room_info(rid)}
 
-                for other in list(self.clients.values()):
-                    if other.sock is sock:
-                        continue
-                    if other.room_id == rid:
-                        try:
-                            send_message(other.sock, json.dumps(notify, ensure_ascii=False))
-                        except Exception:
-                            pass
-                        if ret == 1:
-                            other.state = "LOGGED_IN"
-                            other.room_id = -1
+                frame = encode_frame(pack(notify))
+                for other in list(self.room_members.get(rid, {}).values()):
+                    self._push_frame(other, frame)
+                    if ret == 1:
+                        other.state = "LOGGED_IN"
+                        self._set_room(other, -1)
+        self._set_identity(info, "", "")
 
         try:
             self.sel.unregister(sock)
@@ -151,18 +196,61 @@ class LobbyServer:
             pass
         self.clients.pop(sock, None)
 
+    def _set_identity(self, c: ClientInfo, username: str, role: str) -> None:
+        """Set (or clear, with empty strings) who a client is logged in as, keeping clients_by_role in sync."""
+        if c.role:
+            members = self.clients_by_role.get(c.role)
+            if members is not None:
+                members.pop(c.sock, None)
+        c.username = username
+        c.role = role
+        if role:
+            self.clients_by_role.setdefault(role, {})[c.sock] = c
+
+    def _set_room(self, c: ClientInfo, rid: int) -> None:
+        """Move a client to room `rid` (-1 for none), keeping room_members in sync."""
+        if c.room_id != -1:
+            members = self.room_members.get(c.room_id)
+            if members is not None:
+                members.pop(c.sock, None)
+                if not members:
+                    del self.room_members[c.room_id]
+        c.room_id = rid
+        if rid != -1:
+            self.room_members.setdefault(rid, {})[c.sock] = c
+
     def _service(self, key: selectors.SelectorKey) -> None:
         info: ClientInfo = key.data
         sock = info.sock
 
         try:
-            req_str = recv_message(sock)
-        except Exception:
+            chunk = sock.recv(RECV_CHUNK)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            chunk = b""
+        if not chunk:
             self._disconnect(info)
             return
 
+        info.rxbuf += chunk
         try:
-            req = json.loads(req_str)
+            frames = split_frames(info.rxbuf)
+        except ValueError:
+            self._disconnect(info)
+            return
+        for payload in frames:
+            try:
+                req_str = payload.decode("utf-8")
+            except UnicodeDecodeError:
+                self._disconnect(info)
+                return
+            self._dispatch(info, req_str)
+
+    def _dispatch(self, info: ClientInfo, req_str: str) -> None:
+        sock = info.sock
+        try:
+            req = unpack(req_str)
         except Exception:
             return
 
@@ -170,18 +258,83 @@ class LobbyServer:
         who = info.username or "Guest"
         print(f"[Req] {who}: {action}")
 
-        # Dispatch to the corresponding action handler, e.g. action='login' -> _act_login().
-        handler = getattr(self, f"_act_{action}", None)
-        if not handler:
-            self._send(sock, {"status": "error", "message": f"Unknown action: {action}"})
-            return
+        self._reply_to = (sock, req.get("req_id"))
         try:
-            handler(info, req)
-        except Exception as e:
-            self._send(sock, {"status": "error", "message": f"Server exception: {type(e).__name__}"})
+            handler = self._handlers.get(action)
+            if not handler:
+                self._send(sock, {"status": "error", "message": f"Unknown action: {action}"})
+                return
+            try:
+                handler(info, req)
+            except Exception as e:
+                self._send(sock, {"status": "error", "message": f"Server exception: {type(e).__name__}"})
+        finally:
+            self._reply_to = (None, None)
 
     def _send(self, sock: socket.socket, obj: Dict[str, Any]) -> None:
-        send_message(sock, json.dumps(obj, ensure_ascii=False))
+        # Tag the reply (never notifications, which carry no "status") with the request's id.
+        rsock, rid = self._reply_to
+        if rid is not None and sock is rsock and "status" in obj:
+            obj = {**obj, "req_id": rid}
+        c = self.clients.get(sock)
+        if c is not None:
+            self._push(c, pack(obj))
+
+    def _send_data(self, sock: socket.socket, data_json: str) -> None:
+        """Send {"status": "ok", "data": ...} where the data is already JSON-encoded."""
+        rsock, rid = self._reply_to
+        tail = f',"req_id":{pack(rid).decode("utf-8")}' if rid is not None and sock is rsock else ""
+        c = self.clients.get(sock)
+        if c is not None:
+            self._push(c, f'{{"status":"ok","data":{data_json}{tail}}}')
+
+    def _push(self, c: ClientInfo, message: Union[str, bytes]) -> None:
+        self._push_frame(c, encode_frame(message))
+
+    def _push_frame(self, c: ClientInfo, frame: bytes) -> None:
+        """Queue one complete frame for a client and write as much as the socket takes now.
+
+        Room fan-out encodes a notification once and passes the same frame to
+        every member. Never blocks, raises or disconnects (callers may be
+        iterating a room); a dead or stalled peer is shut down and reaped by
+        the read path.
+        """
+        if c.txbuf:
+            c.txbuf += frame
+        else:
+            try:
+                sent = c.sock.send(frame)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                return
+            if sent == len(frame):
+                return
+            c.txbuf += memoryview(frame)[sent:]
+            self.sel.modify(c.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, data=c)
+        if len(c.txbuf) > MAX_PENDING_SEND:
+            self._abort(c)
+
+    def _flush(self, c: ClientInfo) -> None:
+        try:
+            sent = c.sock.send(c.txbuf)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._abort(c)
+            return
+        del c.txbuf[:sent]
+        if not c.txbuf:
+            self.sel.modify(c.sock, selectors.EVENT_READ, data=c)
+
+    def _abort(self, c: ClientInfo) -> None:
+        # Make the socket readable-at-EOF so _service() runs the normal disconnect.
+        c.txbuf.clear()
+        try:
+            self.sel.modify(c.sock, selectors.EVENT_READ, data=c)
+            c.sock.shutdown(socket.SHUT_RDWR)
+        except (OSError, ValueError, KeyError):
+            pass
 
     # ===================== Actions =====================
     def _act_register(self, c: ClientInfo, req: Dict[str, Any]) -> None:
@@ -221,21 +374,22 @@ class LobbyServer:
             return
 
         c.state = "LOGGED_IN"
-        c.username = target
-        c.role = role
-        c.room_id = -1
+        self._set_identity(c, target, role)
+        self._set_room(c, -1)
         self.sessions[session_key] = c
         self._send(c.sock, {"status": "ok", "role": role})
 
 
     def _act_list_games(self, c: ClientInfo, req: Dict[str, Any]) -> None:
-        self._send(c.sock, {"status": "ok", "data": self.db.get_games()})
+        # Optional "dev" filter lets the developer client fetch only its own games.
+        dev = req.get("dev")
+        self._send_data(c.sock, self.db.get_games_json(str(dev) if dev else None))
 
     def _act_list_rooms(self, c: ClientInfo, req: Dict[str, Any]) -> None:
         self._send(c.sock, {"status": "ok", "data": self.rooms.list_rooms()})
 
     def _act_list_players(self, c: ClientInfo, req: Dict[str, Any]) -> None:
-        players = [ci.username for ci in self.clients.values() if ci.username and ci.role == "player"]
+        players = [ci.username for ci in self.clients_by_role.get("player", {}).values() if ci.username]
         self._send(c.sock, {"status": "ok", "data": players})
 
     def _act_upload_request(self, c: ClientInfo, req: Dict[str, Any]) -> None:
@@ -272,6 +426,7 @@ class LobbyServer:
         # The client connects to this port to receive the file bytes.
         transfer_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         transfer_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        _set_transfer_buffers(transfer_sock)
         transfer_sock.bind(("0.0.0.0", 0))
         transfer_sock.listen(1)
         port = transfer_sock.getsockname()[1]
@@ -303,17 +458,21 @@ class LobbyServer:
             with data_sock:
                 data_sock.settimeout(10)
                 save_path.parent.mkdir(parents=True, exist_ok=True)
+                # One receive buffer for the whole transfer; each chunk is written
+                # straight from it instead of allocating a new bytes object.
+                buf = bytearray(TRANSFER_CHUNK)
+                mv = memoryview(buf)
                 with open(save_path, "wb") as f:
                     remaining = filesize
-                    chunk = 4096
                     while remaining > 0:
-                        n = chunk if remaining > chunk else remaining
                         try:
-                            buf = recv_raw_exact(data_sock, n)
+                            got = data_sock.recv_into(mv, min(remaining, TRANSFER_CHUNK))
                         except Exception:
                             break
-                        f.write(buf)
-                        remaining -= n
+                        if not got:
+                            break
+                        f.write(mv[:got])
+                        remaining -= got
         finally:
             try:
                 transfer_sock.close()
@@ -334,11 +493,12 @@ class LobbyServer:
             self._send(c.sock, {"status": "error", "message": "File missing on server"})
             return
 
-        self.db.record_download(gamename, c.username)
+        self._db_writer.submit(self.db.record_download, gamename, c.username)
 
         fsize = filepath.stat().st_size
         transfer_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         transfer_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        _set_transfer_buffers(transfer_sock)
         transfer_sock.bind(("0.0.0.0", 0))
         transfer_sock.listen(1)
         port = transfer_sock.getsockname()[1]
@@ -365,14 +525,12 @@ class LobbyServer:
             with data_sock:
                 data_sock.settimeout(10)
                 with open(filepath, "rb") as f:
-                    while True:
-                        buf = f.read(4096)
-                        if not buf:
-                            break
-                        try:
-                            send_raw(data_sock, buf)
-                        except Exception:
-                            break
+                    # sendfile(2) where available: the kernel copies file pages straight
+                    # to the socket; socket.sendfile falls back to a send loop elsewhere.
+                    try:
+                        data_sock.sendfile(f)
+                    except Exception:
+                        pass
         finally:
             try:
                 transfer_sock.close()
@@ -407,24 +565,22 @@ class LobbyServer:
 
         rid = self.rooms.create_room(rname, c.username, gname, self.db.get_game_max_players(gname))
         c.state = "IN_ROOM"
-        c.room_id = rid
+        self._set_room(c, rid)
         self._send(c.sock, {"status": "ok", "room_id": rid, "data": self.rooms.get_room_info(rid)})
 
     def _act_join_room(self, c: ClientInfo, req: Dict[str, Any]) -> None:
         rid = int(req.get("room_id", -1))
         if self.rooms.join_room(rid, c.username):
             c.state = "IN_ROOM"
-            c.room_id = rid
+            self._set_room(c, rid)
             res = {"status": "ok", "message": "Joined", "data": self.rooms.get_room_info(rid)}
             self._send(c.sock, res)
 
             notify = {"action": "player_joined", "username": c.username, "data": self.rooms.get_room_info(rid)}
-            for other in self.clients.values():
-                if other.room_id == rid and other.sock is not c.sock:
-                    try:
-                        send_message(other.sock, json.dumps(notify, ensure_ascii=False))
-                    except Exception:
-                        pass
+            frame = encode_frame(pack(notify))
+            for other in self.room_members.get(rid, {}).values():
+                if other.sock is not c.sock:
+                    self._push_frame(other, frame)
         else:
             self._send(c.sock, {"status": "error", "message": "Cannot join (Room full or playing)"})
 
@@ -441,18 +597,15 @@ class LobbyServer:
         else:
             notify = {"action": "player_left", "username": c.username, "data": self.rooms.get_room_info(rid)}
 
-        for other in self.clients.values():
-            if other.room_id == rid and other.sock is not c.sock:
-                try:
-                    send_message(other.sock, json.dumps(notify, ensure_ascii=False))
-                except Exception:
-                    pass
-                if ret == 1:
-                    other.state = "LOGGED_IN"
-                    other.room_id = -1
-
         c.state = "LOGGED_IN"
-        c.room_id = -1
+        self._set_room(c, -1)
+        frame = encode_frame(pack(notify))
+        for other in list(self.room_members.get(rid, {}).values()):
+            self._push_frame(other, frame)
+            if ret == 1:
+                other.state = "LOGGED_IN"
+                self._set_room(other, -1)
+
         self._send(c.sock, {"status": "ok"})
 
     def _act_start_game(self, c: ClientInfo, req: Dict[str, Any]) -> None:
@@ -485,12 +638,9 @@ class LobbyServer:
         self.rooms.start_game(c.room_id, game_port)
 
         broadcast = {"action": "game_start", "game_port": game_port, "filename": filename}
-        for other in self.clients.values():
-            if other.room_id == c.room_id:
-                try:
-                    send_message(other.sock, json.dumps(broadcast, ensure_ascii=False))
-                except Exception:
-                    pass
+        frame = encode_frame(pack(broadcast))
+        for other in self.room_members.get(c.room_id, {}).values():
+            self._push_frame(other, frame)
 
         # IMPORTANT: also respond to the requester so clients doing RPC won't block
         self._send(c.sock, {"status": "ok", "message": "Game started"})
@@ -514,12 +664,9 @@ class LobbyServer:
             self.db.record_play_history(str(p), gname)
 
         notify = {"action": "room_reset", "data": self.rooms.get_room_info(c.room_id)}
-        for other in self.clients.values():
-            if other.room_id == c.room_id:
-                try:
-                    send_message(other.sock, json.dumps(notify, ensure_ascii=False))
-                except Exception:
-                    pass
+        frame = encode_frame(pack(notify))
+        for other in self.room_members.get(c.room_id, {}).values():
+            self._push_frame(other, frame)
 
         self._send(c.sock, {"status": "ok", "message": "Game finished"})
 
@@ -546,9 +693,8 @@ class LobbyServer:
             self.rooms.leave_room(c.room_id, c.username)
 
         c.state = "CONNECTED"
-        c.username = ""
-        c.role = ""
-        c.room_id = -1
+        self._set_identity(c, "", "")
+        self._set_room(c, -1)
         self._send(c.sock, {"status": "ok"})
 
 
@@ -5,17 +5,62 @@ from __future__ import annotations
 Thread-safe JSON database wrapper.
 
 This module persists:
-- users (username/password/role + play history)
+- users (username/salted password hash/role + play history)
 - games (metadata, file name, download history, and comments)
 
-It intentionally uses a coarse lock to keep the JSON file consistent for this homework-scale project.
+Users and games each have their own writer lock. Records are never mutated
+after they are published in an index: writers build a new record (and a new
+index dict) and swap the reference, so readers take no lock at all.
+
+Persistence is a snapshot plus a journal: each mutation appends one JSON line
+(`{"op": ..., "args": [...]}`) to the journal next to the database file, and a
+background thread periodically rewrites the snapshot and truncates the journal.
+On startup the snapshot is loaded and the journal tail is replayed.
 """
 
 
+import hashlib
+import hmac
 import json
+import os
 import threading
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+SNAPSHOT_INTERVAL = 30.0  # seconds between background snapshots (if anything changed)
+SNAPSHOT_EVERY = 1000     # journal entries that force an early snapshot
+
+# Methods whose calls are journaled and replayed on startup. Accounts are
+# journaled as the stored record (_set_user) so no plaintext password is written.
+_JOURNALED_OPS = frozenset(
+    {"_set_user", "record_play_history", "upsert_game", "delete_game", "record_download", "add_comment"}
+)
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _hash_password(password: str, salt: bytes) -> str:
+    return hashlib.blake2b(password.encode("utf-8"), digest_size=16, salt=salt).hexdigest()
+
+
+def _with_password(u: Dict[str, Any], password: str) -> Dict[str, Any]:
+    """Return a copy of account u storing a fresh salted hash of password (and no plaintext)."""
+    salt = os.urandom(hashlib.blake2b.SALT_SIZE)
+    out = {k: v for k, v in u.items() if k != "password"}
+    out["salt"] = salt.hex()
+    out["pwhash"] = _hash_password(password, salt)
+    return out
+
+
+def _password_ok(u: Dict[str, Any], password: str) -> bool:
+    """Constant-time password check; accounts saved before hashing still hold plaintext."""
+    if "pwhash" in u:
+        try:
+            salt = bytes.fromhex(str(u.get("salt", "")))
+        except ValueError:
+            return False
+        return hmac.compare_digest(str(u["pwhash"]), _hash_password(password, salt))
+    return hmac.compare_digest(str(u.get("password", "")).encode("utf-8"), password.encode("utf-8"))
 
 
 def _calc_rating(comments: List[Dict[str, Any]]) -> float:
@@ -26,93 +71,216 @@ def _calc_rating(comments: List[Dict[str, Any]]) -> float:
 
 
 class Database:
-    """Simple JSON-file database with a coarse lock for thread safety."""
+    """JSON-file database with per-table writer locks and lock-free reads."""
     def __init__(self, db_file: str | Path = "database.json"):
         self.db_file = Path(db_file)
-        self._lock = threading.Lock()
+        self._users_lock = threading.RLock()
+        self._games_lock = threading.RLock()
+        self._journal_lock = threading.Lock()
         self._data: Dict[str, Any] = {"users": [], "games": []}
+        # Name-keyed indexes; these are the live tables and self._data is only
+        # refreshed from them when a snapshot is written. Accounts are grouped
+        # per username in insertion order, since one name may exist once per role.
+        self._games_by_name: Dict[str, Dict[str, Any]] = {}
+        self._users_by_name: Dict[str, List[Dict[str, Any]]] = {}
+        # Membership sets mirroring the persisted lists: play history per
+        # username (published with the accounts, read lock-free), and per game
+        # the users who downloaded / rated it (writer-side only, games lock).
+        self._play_sets: Dict[str, FrozenSet[str]] = {}
+        self._downloaders: Dict[str, Set[str]] = {}
+        self._raters: Dict[str, Set[str]] = {}
+        # get_games_json() results for one version of _games_by_name. Every game
+        # mutation swaps in a new index dict, which invalidates this implicitly.
+        self._games_json_cache: Tuple[Dict[str, Dict[str, Any]], Dict[Optional[str], str]] = ({}, {})
+
+        self.journal_file = self.db_file.with_suffix(".log")
+        self._replaying = False
+        self._pending = 0  # journal entries since the last snapshot
         self._load()
 
+        self._journal = open(self.journal_file, "ab", buffering=0)
+        self._wake = threading.Event()
+        self._closed = False
+        threading.Thread(target=self._snapshot_loop, daemon=True).start()
+
     def _load(self) -> None:
-        if not self.db_file.exists():
-            self._save()
-            return
-        try:
-            self._data = json.loads(self.db_file.read_text(encoding="utf-8"))
-        except Exception:
-            self._data = {}
+        if self.db_file.exists():
+            try:
+                self._data = json.loads(self.db_file.read_text(encoding="utf-8"))
+            except Exception:
+                # Keep the unreadable file instead of overwriting it with an empty snapshot.
+                bak = self.db_file.with_name(self.db_file.name + ".bak")
+                os.replace(self.db_file, bak)
+                print(f"[DB] Could not parse {self.db_file}; moved it to {bak} and starting empty")
+                self._data = {}
         self._data.setdefault("users", [])
         self._data.setdefault("games", [])
-        self._save()
+        self._build_indexes()
+        self._replay()
+        self._snapshot()
+
+    def _replay(self) -> None:
+        """Re-apply journal entries written after the last snapshot."""
+        if not self.journal_file.exists():
+            return
+        self._replaying = True
+        try:
+            with open(self.journal_file, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash mid-append
+                    op = entry.get("op")
+                    if op in _JOURNALED_OPS:
+                        getattr(self, op)(*entry.get("args", ()))
+        finally:
+            self._replaying = False
+
+    def _build_indexes(self) -> None:
+        self._games_by_name = {}
+        for g in self._data["games"]:
+            self._games_by_name.setdefault(str(g.get("name")), g)
+        self._users_by_name = {}
+        for u in self._data["users"]:
+            self._users_by_name.setdefault(str(u.get("username")), []).append(u)
+        self._play_sets = {
+            name: frozenset(accounts[0].get("play_history", ())) for name, accounts in self._users_by_name.items()
+        }
+        self._downloaders = {name: set(g.get("downloaded_by", ())) for name, g in self._games_by_name.items()}
+        self._raters = {name: {c.get("user") for c in g.get("comments", ())} for name, g in self._games_by_name.items()}
+
+    def _record(self, op: str, *args: Any) -> None:
+        """Journal a mutation that has just been applied (caller holds its table lock)."""
+        if self._replaying:
+            return
+        line = (_encoder.encode({"op": op, "args": args}) + "\n").encode("utf-8")
+        with self._journal_lock:
+            self._journal.write(line)
+            self._pending += 1
+            if self._pending >= SNAPSHOT_EVERY:
+                self._wake.set()
+
+    def _snapshot(self) -> None:
+        """Write the full database and truncate the journal.
+
+        Callers hold both table locks (or are still in __init__) so no
+        mutation can land between the dump and the truncate.
+        """
+        self._data["users"] = [u for accounts in self._users_by_name.values() for u in accounts]
+        self._data["games"] = list(self._games_by_name.values())
+        tmp = self.db_file.with_name(self.db_file.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_encoder.encode(self._data).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        # Readers see either the old or the new snapshot, never a torn one.
+        os.replace(tmp, self.db_file)
+        with open(self.journal_file, "wb"):
+            pass
+        self._pending = 0
+
+    def _snapshot_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(SNAPSHOT_INTERVAL)
+            self._wake.clear()
+            with self._users_lock, self._games_lock:
+                if self._pending and not self._closed:
+                    self._snapshot()
 
-    def _save(self) -> None:
-        self.db_file.write_text(json.dumps(self._data, ensure_ascii=False, indent=4), encoding="utf-8")
+    def close(self) -> None:
+        """Flush everything into the snapshot and stop the background thread."""
+        with self._users_lock, self._games_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._snapshot()
+            self._journal.close()
+        self._wake.set()
 
     # ---------------- users ----------------
+    def _put_accounts(self, username: str, accounts: List[Dict[str, Any]]) -> None:
+        index = dict(self._users_by_name)
+        index[username] = accounts
+        plays = dict(self._play_sets)
+        plays[username] = frozenset(accounts[0].get("play_history", ())) if accounts else frozenset()
+        self._users_by_name = index
+        self._play_sets = plays
+
+    def _set_user(self, u: Dict[str, Any]) -> None:
+        """Store account u, replacing the same username+role if present."""
+        with self._users_lock:
+            username = str(u.get("username"))
+            accounts = list(self._users_by_name.get(username, ()))
+            for i, a in enumerate(accounts):
+                if a.get("role") == u.get("role"):
+                    accounts[i] = u
+                    break
+            else:
+                accounts.append(u)
+            self._put_accounts(username, accounts)
+            self._record("_set_user", u)
+
     def register_user(self, username: str, password: str, role: str) -> bool:
-        with self._lock:
-            for u in self._data["users"]:
-                if u.get("username") == username and u.get("role") == role:
-                    return False
-            self._data["users"].append({"username": username, "password": password, "role": role})
-            self._save()
+        with self._users_lock:
+            if any(u.get("role") == role for u in self._users_by_name.get(username, ())):
+                return False
+            self._set_user(_with_password({"username": username, "role": role}, password))
             return True
 
     def login_user(self, username: str, password: str, role_hint: Optional[str] = None) -> Optional[str]:
-        with self._lock:
-            for u in self._data["users"]:
-                if u.get("username") == username and u.get("password") == password:
-                    role = str(u.get("role", "player"))
-                    if role_hint and role != role_hint:
-                        continue
-                    return role
+        for u in self._users_by_name.get(username, ()):
+            role = str(u.get("role", "player"))
+            if role_hint and role != role_hint:
+                continue
+            if not _password_ok(u, password):
+                continue
+            if "pwhash" not in u:
+                # Legacy plaintext account: upgrade it now that we know the password.
+                self._set_user(_with_password(u, password))
+            return role
         return None
 
     def record_play_history(self, username: str, game_name: str) -> None:
-        with self._lock:
-            for u in self._data["users"]:
-                if u.get("username") == username:
-                    ph = u.setdefault("play_history", [])
-                    if game_name not in ph:
-                        ph.append(game_name)
-                        self._save()
-                    return
+        with self._users_lock:
+            accounts = self._users_by_name.get(username)
+            if not accounts:
+                return
+            if game_name in self._play_sets.get(username, ()):
+                return
+            u = accounts[0]
+            ph = u.get("play_history", [])
+            self._put_accounts(username, [{**u, "play_history": ph + [game_name]}] + accounts[1:])
+            self._record("record_play_history", username, game_name)
 
     def has_played(self, username: str, game_name: str) -> bool:
-        with self._lock:
-            for u in self._data["users"]:
-                if u.get("username") == username:
-                    return game_name in u.get("play_history", [])
-        return False
+        return game_name in self._play_sets.get(username, ())
 
     # ---------------- games ----------------
+    def _put_game(self, game_name: str, g: Optional[Dict[str, Any]]) -> None:
+        """Publish a new version of a game record (None removes it)."""
+        index = dict(self._games_by_name)
+        if g is None:
+            index.pop(game_name, None)
+        else:
+            index[game_name] = g
+        self._games_by_name = index
+
     def get_game_owner(self, game_name: str) -> str:
-        with self._lock:
-            for g in self._data["games"]:
-                if g.get("name") == game_name:
-                    return str(g.get("dev", ""))
-        return ""
+        g = self._games_by_name.get(game_name)
+        return str(g.get("dev", "")) if g else ""
 
     def get_game_filename(self, game_name: str) -> str:
-        with self._lock:
-            for g in self._data["games"]:
-                if g.get("name") == game_name:
-                    return str(g.get("filename", ""))
-        return ""
+        g = self._games_by_name.get(game_name)
+        return str(g.get("filename", "")) if g else ""
 
     def get_game_version(self, game_name: str) -> str:
-        with self._lock:
-            for g in self._data["games"]:
-                if g.get("name") == game_name:
-                    return str(g.get("version", "1.0"))
-        return "1.0"
+        g = self._games_by_name.get(game_name)
+        return str(g.get("version", "1.0")) if g else "1.0"
 
     def get_game_max_players(self, game_name: str) -> int:
-        with self._lock:
-            for g in self._data["games"]:
-                if g.get("name") == game_name:
-                    return int(g.get("max_players", 2))
-        return 2
+        g = self._games_by_name.get(game_name)
+        return int(g.get("max_players", 2)) if g else 2
 
     def upsert_game(
         self,
@@ -125,76 +293,91 @@ class Database:
         max_players: int,
     ) -> None:
         """Insert a new game entry or update an existing one owned by the developer."""
-        with self._lock:
-            for g in self._data["games"]:
-                if g.get("name") == game_name and g.get("dev") == dev_name:
-                    g["description"] = desc
-                    g["filename"] = filename
-                    g["version"] = version
-                    g["game_type"] = game_type
-                    g["max_players"] = max_players
-                    self._save()
-                    return
-
-            self._data["games"].append(
-                {
-                    "name": game_name,
-                    "dev": dev_name,
-                    "description": desc,
-                    "filename": filename,
-                    "version": version,
-                    "game_type": game_type,
-                    "max_players": max_players,
-                    "downloaded_by": [],
-                    "comments": [],
-                }
-            )
-            self._save()
+        with self._games_lock:
+            g = self._games_by_name.get(game_name)
+            fields = {
+                "description": desc,
+                "filename": filename,
+                "version": version,
+                "game_type": game_type,
+                "max_players": max_players,
+            }
+            if g and g.get("dev") == dev_name:
+                if all(g.get(k) == v for k, v in fields.items()):
+                    return  # re-upload of identical metadata: nothing to journal or invalidate
+                self._put_game(game_name, {**g, **fields})
+            elif not g:
+                self._put_game(game_name, {"name": game_name, "dev": dev_name, **fields, "downloaded_by": [], "comments": []})
+            else:
+                return
+            self._record("upsert_game", dev_name, game_name, desc, filename, version, game_type, max_players)
 
     def delete_game(self, dev_name: str, game_name: str) -> str:
-        with self._lock:
-            games = self._data["games"]
-            for i, g in enumerate(list(games)):
-                if g.get("name") == game_name and g.get("dev") == dev_name:
-                    filename = str(g.get("filename", ""))
-                    games.pop(i)
-                    self._save()
-                    return filename
-        return ""
+        with self._games_lock:
+            g = self._games_by_name.get(game_name)
+            if not g or g.get("dev") != dev_name:
+                return ""
+            self._put_game(game_name, None)
+            self._downloaders.pop(game_name, None)
+            self._raters.pop(game_name, None)
+            self._record("delete_game", dev_name, game_name)
+            return str(g.get("filename", ""))
 
     def record_download(self, game_name: str, username: str) -> None:
-        with self._lock:
-            for g in self._data["games"]:
-                if g.get("name") == game_name:
-                    dl = g.setdefault("downloaded_by", [])
-                    if username not in dl:
-                        dl.append(username)
-                        self._save()
-                    return
+        with self._games_lock:
+            g = self._games_by_name.get(game_name)
+            if not g:
+                return
+            users = self._downloaders.setdefault(game_name, set())
+            if username in users:
+                return
+            users.add(username)
+            self._put_game(game_name, {**g, "downloaded_by": g.get("downloaded_by", []) + [username]})
+            self._record("record_download", game_name, username)
 
     def add_comment(self, game_name: str, user: str, score: int, content: str) -> bool:
-        with self._lock:
-            for g in self._data["games"]:
-                if g.get("name") == game_name:
-                    comments = g.setdefault("comments", [])
-                    if any(c.get("user") == user for c in comments):
-                        return False
-                    comments.append({"user": user, "score": int(score), "content": content})
-                    self._save()
-                    return True
-        return False
-
-    def get_games(self) -> List[Dict[str, Any]]:
-        with self._lock:
-            out: List[Dict[str, Any]] = []
-            for g in self._data["games"]:
-                item = dict(g)
-                comments = item.get("comments") or []
-                item["avg_rating"] = _calc_rating(comments)
-                item["comment_count"] = len(comments)
-
-                downloaded_by = item.get("downloaded_by") or []
-                item["downloads"] = len(downloaded_by)
-                item.pop("downloaded_by", None)
-                out.append(item)
-            return out
+        with self._games_lock:
+            g = self._games_by_name.get(game_name)
+            if not g:
+                return False
+            raters = self._raters.setdefault(game_name, set())
+            if user in raters:
+                return False
+            raters.add(user)
+            comment = {"user": user, "score": int(score), "content": content}
+            self._put_game(game_name, {**g, "comments": g.get("comments", []) + [comment]})
+            self._record("add_comment", game_name, user, score, content)
+            return True
+
+    def get_games(self, dev_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return store entries (optionally only one developer's) with derived stats."""
+        return self._list_games(self._games_by_name, dev_name)
+
+    def get_games_json(self, dev_name: Optional[str] = None) -> str:
+        """Like get_games(), but JSON-encoded and cached until the next game mutation."""
+        index = self._games_by_name
+        owner, cache = self._games_json_cache
+        if owner is not index:
+            cache = {}
+            self._games_json_cache = (index, cache)
+        text = cache.get(dev_name)
+        if text is None:
+            text = cache[dev_name] = _encoder.encode(self._list_games(index, dev_name))
+        return text
+
+    @staticmethod
+    def _list_games(index: Dict[str, Dict[str, Any]], dev_name: Optional[str]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        for g in index.values():
+            if dev_name is not None and g.get("dev") != dev_name:
+                continue
+            item = dict(g)
+            comments = item.get("comments") or []
+            item["avg_rating"] = _calc_rating(comments)
+            item["comment_count"] = len(comments)
+
+            downloaded_by = item.get("downloaded_by") or []
+            item["downloads"] = len(downloaded_by)
+            item.pop("downloaded_by", None)
+            out.append(item)
+        return out
@@ -12,7 +12,9 @@ RoomManager exposes helper methods used by the lobby server.
 """
 
 
+from collections import Counter
 from dataclasses import dataclass, field
+import heapq
 import threading
 from typing import Dict, List, Optional
 
@@ -27,79 +29,119 @@ class Room:
     status: str = "idle"  # idle|playing
     game_port: int = 0
     max_players: int = 2
-    players: List[str] = field(default_factory=list)
+    # Insertion-ordered set of usernames (values unused).
+    players: Dict[str, None] = field(default_factory=dict)
+    # Guards this room's players/status/game_port.
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
 
 
 class RoomManager:
-    """Thread-safe manager for creating/joining/leaving rooms and tracking game state."""
+    """Thread-safe manager for creating/joining/leaving rooms and tracking game state.
+
+    Locking: `_lock` guards the `_rooms` map itself (create/disband) and is
+    taken before any room lock; each Room's own lock guards that room's
+    fields. Operations on one room never wait for another room.
+    """
     def __init__(self):
         self._rooms: Dict[int, Room] = {}
         self._lock = threading.Lock()
+        # Room ids are reused smallest-first (the game port is derived from the
+        # id, so ids must stay small): a min-heap of freed ids below _next_id.
+        self._next_id = 1
+        self._free_ids: List[int] = []
+        # game name -> number of rooms using it; kept alongside _rooms.
+        self._game_rooms: Counter = Counter()
+
+    def _get(self, room_id: int) -> Optional[Room]:
+        return self._rooms.get(room_id)  # a single dict lookup is atomic
+
+    def _disband(self, room_id: int) -> None:
+        # Caller holds self._lock.
+        r = self._rooms.pop(room_id, None)
+        if r is not None:
+            heapq.heappush(self._free_ids, room_id)
+            left = self._game_rooms[r.game_name] - 1
+            if left > 0:
+                self._game_rooms[r.game_name] = left
+            else:
+                del self._game_rooms[r.game_name]
 
     def create_room(self, name: str, host: str, game_name: str, max_players: int) -> int:
         with self._lock:
-            rid = 1
-            while rid in self._rooms:
-                rid += 1
-            r = Room(id=rid, name=name, host_user=host, game_name=game_name, max_players=max_players, players=[host])
+            if self._free_ids:
+                rid = heapq.heappop(self._free_ids)
+            else:
+                rid = self._next_id
+                self._next_id += 1
+            r = Room(id=rid, name=name, host_user=host, game_name=game_name, max_players=max_players, players={host: None})
             self._rooms[rid] = r
+            self._game_rooms[game_name] += 1
             return rid
 
     def join_room(self, room_id: int, user: str) -> bool:
-        with self._lock:
-            r = self._rooms.get(room_id)
-            if not r:
-                return False
+        r = self._get(room_id)
+        if not r:
+            return False
+        with r.lock:
+            if self._rooms.get(room_id) is not r:
+                return False  # disbanded meanwhile
             if r.status != "idle":
                 return False
             if user in r.players:
                 return False
             if len(r.players) >= r.max_players:
                 return False
-            r.players.append(user)
+            r.players[user] = None
             return True
 
     def is_room_full(self, room_id: int) -> bool:
-        with self._lock:
-            r = self._rooms.get(room_id)
-            return bool(r and len(r.players) == r.max_players)
+        r = self._get(room_id)
+        if not r:
+            return False
+        with r.lock:
+            return len(r.players) == r.max_players
 
     def leave_room(self, room_id: int, user: str) -> int:
         """Return 1 if room disbanded, 0 if left, -1 if noop."""
+        # May disband, so take the map lock first (lock order: map, then room).
         with self._lock:
             r = self._rooms.get(room_id)
             if not r:
                 return -1
-            if r.host_user == user:
-                self._rooms.pop(room_id, None)
-                return 1
-            if user in r.players:
-                r.players.remove(user)
-                if not r.players:
-                    self._rooms.pop(room_id, None)
+            with r.lock:
+                if r.host_user == user:
+                    self._disband(room_id)
                     return 1
-                return 0
-            return -1
+                if user in r.players:
+                    del r.players[user]
+                    if not r.players:
+                        self._disband(room_id)
+                        return 1
+                    return 0
+                return -1
 
     def list_rooms(self):
+        # Only the snapshot of the map needs the lock; the summaries are built
+        # after releasing it (single attribute reads are atomic).
         with self._lock:
-            return [
-                {
-                    "id": r.id,
-                    "name": r.name,
-                    "game": r.game_name,
-                    "status": r.status,
-                    "players": len(r.players),
-                    "max_players": r.max_players,
-                }
-                for r in self._rooms.values()
-            ]
+            rooms = list(self._rooms.values())
+        return [
+            {
+                "id": r.id,
+                "name": r.name,
+                "game": r.game_name,
+                "status": r.status,
+                "players": len(r.players),
+                "max_players": r.max_players,
+            }
+            for r in rooms
+        ]
 
     def get_room_info(self, room_id: int):
-        with self._lock:
-            r = self._rooms.get(room_id)
-            if not r:
-                return None
+        r = self._get(room_id)
+        if not r:
+            return None
+        with r.lock:
             return {
                 "id": r.id,
                 "name": r.name,
@@ -112,23 +154,22 @@ class RoomManager:
             }
 
     def start_game(self, room_id: int, port: int) -> bool:
-        with self._lock:
-            r = self._rooms.get(room_id)
-            if not r:
-                return False
+        r = self._get(room_id)
+        if not r:
+            return False
+        with r.lock:
             r.status = "playing"
             r.game_port = int(port)
             return True
 
     def finish_game(self, room_id: int) -> bool:
-        with self._lock:
-            r = self._rooms.get(room_id)
-            if not r:
-                return False
+        r = self._get(room_id)
+        if not r:
+            return False
+        with r.lock:
             r.status = "idle"
             r.game_port = 0
             return True
 
     def is_game_active(self, game_name: str) -> bool:
-        with self._lock:
-            return any(r.game_name == game_name for r in self._rooms.values())
+        return game_name in self._game_rooms  # a single dict lookup is atomic
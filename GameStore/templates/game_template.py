@@ -17,34 +17,161 @@ The player client launches the same script with --client.
 
 
 import argparse
+import contextlib
 import json
+import selectors
 import socket
 import struct
-from dataclasses import dataclass
-from typing import Any, Dict, List
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
 
 # =========================
 # Protocol: length-prefixed JSON
 # =========================
 
+# Payload codec: everything on the wire goes through _pack/_unpack. The
+# encoder/decoder are built once (json.dumps with options builds a new encoder
+# per call), and compact separators keep payloads small.
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_decoder = json.JSONDecoder()
+# Frame header: 4-byte big-endian payload length, compiled once.
+_HDR = struct.Struct("!I")
+_HDR_SIZE = _HDR.size
+
+def _pack(obj: Dict[str, Any]) -> bytes:
+    return _encoder.encode(obj).encode("utf-8")
+
+def _unpack(data: Any) -> Dict[str, Any]:
+    return _decoder.decode(str(data, "utf-8"))
+
+# Linux only. The kernel drops back to delayed ACKs on its own, so this is
+# re-armed after every receive rather than set once.
+_QUICKACK = getattr(socket, "TCP_QUICKACK", None)
+
+def _quickack(sock: socket.socket) -> None:
+    if _QUICKACK is not None:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, _QUICKACK, 1)
+        except OSError:
+            pass
+
+def _tune(sock: socket.socket) -> None:
+    """Latency options for a connected game socket (messages are tiny, so no buffer sizing)."""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    _quickack(sock)
+
+def encode_frame(obj: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """Encode obj as a (length prefix, payload) frame, reusable across recipients."""
+    data = _pack(obj)
+    return _HDR.pack(len(data)), data
+
+def send_frame(sock: socket.socket, frame: Tuple[bytes, bytes]) -> None:
+    hdr, data = frame
+    if not hasattr(sock, "sendmsg"):  # e.g. Windows
+        sock.sendall(hdr + data)
+        return
+    # Gather write: prefix and payload leave in one syscall without being
+    # concatenated into a new buffer first.
+    sent = sock.sendmsg(frame)
+    if sent < len(hdr):
+        sock.sendall(hdr[sent:])
+        sent = len(hdr)
+    if sent - len(hdr) < len(data):
+        sock.sendall(memoryview(data)[sent - len(hdr):])
+
 def send_json(sock: socket.socket, obj: Dict[str, Any]) -> None:
-    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
-    sock.sendall(struct.pack("!I", len(data)) + data)
-
-def recv_exact(sock: socket.socket, n: int) -> bytes:
-    buf = b""
-    while len(buf) < n:
-        chunk = sock.recv(n - len(buf))
-        if not chunk:
+    send_frame(sock, encode_frame(obj))
+
+# Receive buffers for recv_json, reused across messages: power-of-two size ->
+# free buffers of that size. Each bucket is capped to bound idle memory.
+POOL_PER_SIZE = 4
+_buf_pool: Dict[int, List[bytearray]] = {}
+
+def _acquire(n: int) -> bytearray:
+    size = 1 << max(n - 1, 0).bit_length()
+    free = _buf_pool.get(size)
+    return free.pop() if free else bytearray(size)
+
+def _release(buf: bytearray) -> None:
+    free = _buf_pool.setdefault(len(buf), [])
+    if len(free) < POOL_PER_SIZE:
+        free.append(buf)
+
+def _recv_into(sock: socket.socket, mv: memoryview, n: int) -> None:
+    got = 0
+    while got < n:
+        r = sock.recv_into(mv[got:n], n - got)
+        if not r:
             raise ConnectionError("socket closed")
-        buf += chunk
+        got += r
+
+def recv_exact(sock: socket.socket, n: int) -> bytearray:
+    # Receive straight into one preallocated buffer (no per-chunk bytes concat).
+    buf = bytearray(n)
+    _recv_into(sock, memoryview(buf), n)
     return buf
 
 def recv_json(sock: socket.socket) -> Dict[str, Any]:
-    (length,) = struct.unpack("!I", recv_exact(sock, 4))
-    data = recv_exact(sock, length)
-    return json.loads(data.decode("utf-8"))
+    buf = _acquire(_HDR_SIZE)
+    try:
+        _recv_into(sock, memoryview(buf), _HDR_SIZE)
+        (length,) = _HDR.unpack_from(buf)
+    finally:
+        _release(buf)
+    buf = _acquire(length)
+    try:
+        mv = memoryview(buf)
+        _recv_into(sock, mv, length)
+        _quickack(sock)
+        return _unpack(mv[:length])
+    finally:
+        _release(buf)
+
+# Lets a blocking socket be read without waiting (POSIX); 0 where unsupported.
+_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+
+def recv_ready(c: Any) -> List[Dict[str, Any]]:
+    """Drain what c.sock has queued (without blocking) and return every complete message.
+
+    Call it when the selector reports c.sock readable. c carries the
+    connection's receive buffer (c.rxbuf / c.rxlen); bytes of a message that
+    has not fully arrived yet stay there until the next call.
+    """
+    flags = 0  # the first read cannot block: the socket was reported readable
+    while True:
+        if c.rxlen == len(c.rxbuf):
+            c.rxbuf.extend(bytes(len(c.rxbuf)))  # more queued than the buffer holds
+        space = len(c.rxbuf) - c.rxlen
+        try:
+            n = c.sock.recv_into(memoryview(c.rxbuf)[c.rxlen:], space, flags)
+        except (BlockingIOError, InterruptedError):
+            break
+        if not n:
+            if flags:
+                break  # report the close on the next wake, after these messages
+            raise ConnectionError("socket closed")
+        c.rxlen += n
+        # A short read means the kernel queue is empty: no second syscall.
+        if n < space or not _DONTWAIT:
+            break
+        flags = _DONTWAIT
+    _quickack(c.sock)
+
+    mv = memoryview(c.rxbuf)
+    msgs: List[Dict[str, Any]] = []
+    off = 0
+    while c.rxlen - off >= _HDR_SIZE:
+        (length,) = _HDR.unpack_from(c.rxbuf, off)
+        end = off + _HDR_SIZE + length
+        if end > c.rxlen:
+            break
+        msgs.append(_unpack(mv[off + _HDR_SIZE:end]))
+        off = end
+    if off:
+        mv[:c.rxlen - off] = mv[off:c.rxlen]
+        c.rxlen -= off
+    return msgs
 
 
 # =========================
@@ -53,6 +180,7 @@ def recv_json(sock: socket.socket) -> Dict[str, Any]:
 
 MAX_PLAYERS = 2
 GAME_NAME = "Rock Paper Scissors"
+RX_BUF_SIZE = 4096  # initial per-player receive buffer (grows for larger messages)
 
 
 @dataclass
@@ -60,6 +188,9 @@ class PlayerConn:
     sock: socket.socket
     addr: Any
     pid: int  # 0..MAX_PLAYERS-1
+    rxbuf: bytearray = field(default_factory=lambda: bytearray(RX_BUF_SIZE))
+    rxlen: int = 0  # bytes of rxbuf holding received, not yet parsed data
+    alive: bool = True  # False once a send/recv on sock failed; nothing more is sent to it
 
 
 # =========================
@@ -73,11 +204,30 @@ BEATS = {
     "scissors": "paper",
 }
 
+def _settle(a: str, b: str) -> Tuple[int, str]:
+    wa, wb = VALID_MOVES[a], VALID_MOVES[b]
+    if a == b:
+        return -1, "tie"
+    if BEATS[wa] == wb:
+        return 0, f"{wa} beats {wb}"
+    return 1, f"{wb} beats {wa}"
+
+# (P0 move, P1 move) as raw r/p/s -> (winner pid or -1 for a tie, reason).
+# Every outcome is built once here, so settlement is a single lookup.
+OUTCOME: Dict[Tuple[str, str], Tuple[int, str]] = {
+    (a, b): _settle(a, b) for a in VALID_MOVES for b in VALID_MOVES
+}
+
 class GameLogic:
     def __init__(self, n_players: int):
         self.n = n_players
-        self.moves: Dict[int, str] = {}  # pid -> move
+        self.moves: List[Optional[str]] = [None] * n_players  # index = pid, raw r/p/s, None = no move yet
+        self.received = 0
         self.finished = False
+        # The few possible progress events, built once and shared (read-only).
+        self._state_events = [
+            {"type": "state", "received": i, "waiting": n_players - i} for i in range(n_players + 1)
+        ]
 
     def apply_action(self, pid: int, action: Dict[str, Any]) -> Dict[str, Any]:
         if self.finished:
@@ -90,38 +240,24 @@ class GameLogic:
         if raw not in VALID_MOVES:
             return {"type": "error", "message": "invalid move (use r/p/s)"}
 
-        if pid in self.moves:
+        if self.moves[pid] is not None:
             return {"type": "ignored", "reason": "already_moved"}
 
-        self.moves[pid] = VALID_MOVES[raw]
+        self.moves[pid] = raw
+        self.received += 1
 
-        if len(self.moves) < self.n:
-            return {
-                "type": "state",
-                "received": len(self.moves),
-                "waiting": self.n - len(self.moves),
-            }
+        if self.received < self.n:
+            return self._state_events[self.received]
 
         # Settlement (single round)
         self.finished = True
-        p0 = self.moves.get(0)
-        p1 = self.moves.get(1)
-
-        if p0 == p1:
-            winner = -1  # tie
-            reason = "tie"
-        elif BEATS[p0] == p1:
-            winner = 0
-            reason = f"{p0} beats {p1}"
-        else:
-            winner = 1
-            reason = f"{p1} beats {p0}"
+        winner, reason = OUTCOME[(self.moves[0], self.moves[1])]
 
         # Do not reveal opponents' moves during the round; only reveal them in the final result.
         return {
             "type": "result",
             "winner": winner,
-            "moves": self.moves,
+            "moves": {pid: VALID_MOVES[m] for pid, m in enumerate(self.moves)},  # same {pid: move} shape clients read
             "reason": reason,
         }
 
@@ -140,12 +276,23 @@ def run_server(port: int) -> None:
     listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     listener.bind(("0.0.0.0", port))
     listener.listen()
+    sel = selectors.DefaultSelector()
+
+    def broadcast(obj: Dict[str, Any]) -> None:
+        frame = encode_frame(obj)  # encode once, same bytes for every player
+        for q in players:
+            if not q.alive:
+                continue
+            try:
+                send_frame(q.sock, frame)
+            except OSError:
+                q.alive = False
 
     try:
         # 1) 接滿玩家
         while len(players) < MAX_PLAYERS:
             sock, addr = listener.accept()
-            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            _tune(sock)
             pid = len(players)
             players.append(PlayerConn(sock=sock, addr=addr, pid=pid))
             print(f"[Server] Player {pid} connected from {addr}")
@@ -155,52 +302,54 @@ def run_server(port: int) -> None:
             send_json(p.sock, {"type": "start", "pid": p.pid, "n_players": MAX_PLAYERS})
 
         # 3) 主迴圈：收 action -> 更新 -> 廣播
+        # One selector wait across all players: wake only when someone sent data.
+        for p in players:
+            sel.register(p.sock, selectors.EVENT_READ, data=p)
+
         while not logic.finished:
-            for p in players:
+            for key, _ in sel.select(timeout=None):
+                p = key.data
                 try:
-                    p.sock.settimeout(0.2)
-                    msg = recv_json(p.sock)
-                except socket.timeout:
-                    continue
+                    # A message split across segments stays in p.rxbuf until complete.
+                    msgs = recv_ready(p)
                 except Exception:
+                    p.alive = False
                     print("[Server] player disconnected, ending game.")
                     logic.finished = True
                     break
 
-                if msg.get("type") != "action":
-                    continue
+                for msg in msgs:
+                    if msg.get("type") != "action":
+                        continue
 
-                event = logic.apply_action(p.pid, msg.get("action", {}))
+                    event = logic.apply_action(p.pid, msg.get("action", {}))
 
-                # 廣播 event
-                for q in players:
-                    try:
-                        send_json(q.sock, {"type": "event", "event": event})
-                    except Exception:
-                        pass
+                    # Intermediate progress is not broadcast: the round settles
+                    # on the last move, and one result frame tells everyone.
+                    if event.get("type") == "state":
+                        continue
 
-                # 如果出了 result，就結束
-                if event.get("type") == "result":
-                    logic.finished = True
+                    # 廣播 event
+                    broadcast({"type": "event", "event": event})
+
+                    # 如果出了 result，就結束
+                    if event.get("type") == "result":
+                        logic.finished = True
+                        break
+
+                if logic.finished:
                     break
 
         # 4) 收尾：送 end，讓 client 正常 exit 回到房間
-        for p in players:
-            try:
-                send_json(p.sock, {"type": "end"})
-            except Exception:
-                pass
+        broadcast({"type": "end"})
 
     finally:
-        try:
+        sel.close()
+        with contextlib.suppress(OSError):
             listener.close()
-        except Exception:
-            pass
         for p in players:
-            try:
+            with contextlib.suppress(OSError):
                 p.sock.close()
-            except Exception:
-                pass
         print(f"[{GAME_NAME}] Server stopped.")
 
 
@@ -208,10 +357,21 @@ def run_server(port: int) -> None:
 # Client mode
 # =========================
 
+CONNECT_TIMEOUT = 5.0  # seconds; a wrong address fails fast instead of hanging
+
 def run_client(ip: str, port: int) -> None:
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-    sock.connect((ip, port))
+    # A timeout makes connect() non-blocking plus a bounded wait for writability;
+    # the socket goes back to blocking mode for the game itself.
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect((ip, port))
+    except OSError as e:
+        print(f"[Client] Cannot connect to {ip}:{port}: {e}")
+        sock.close()
+        return
+    sock.settimeout(None)
+    _tune(sock)
 
     try:
         start = recv_json(sock)
@@ -284,10 +444,8 @@ def run_client(ip: str, port: int) -> None:
     except Exception as e:
         print("[Client] Disconnected:", type(e).__name__)
     finally:
-        try:
+        with contextlib.suppress(OSError):
             sock.close()
-        except Exception:
-            pass
 
 
 # =========================